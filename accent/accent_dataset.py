@@ -1,153 +1,132 @@
 import os
-import random
 
 import lightning as L
-import torch
-import torch.utils.data
+import numpy as np
+
+from translator.batching import padded_lengths
+from translator.dataset_cache import (append_arrays, batch_loader, cache_dir, close_cache, expand, file_hash, indices, is_val,
+    load_arrays, one_hot, open_cache, positions)
+from translator.encoder import Encoder
 
 
 class AccentDataset(L.LightningDataModule):
     def __init__(self, *, fname='data/cu-words-civic-dedup-accent.txt',
-            max_len=32, batch_size=512):
+            max_len=32, batch_size=512, prefetch=False, bucket=True):
         super().__init__()
         self.fname = fname
         self.max_len = max_len
         self.batch_size = batch_size
-        self._cache = os.path.expanduser(r'~/.cache/accent_dataset1')
+        self.prefetch = prefetch
+        self.bucket = bucket
+        self._name = 'accent_dataset'
 
     def cache(self, name):
         return os.path.join(self._cache, name)
 
     def prepare_data(self):
-        force = self._build_vocab()
-        force = self._make_tensors(force)
+        with open(self.fname, encoding='utf-8') as f:
+            lines = [l.strip() for l in f if l.strip()]
+        print(f'Loaded {len(lines)} samples')
 
-    def _build_vocab(self):
-        if all(os.path.isfile(x) for x in [
-            self.cache('vocab.txt'),
-            self.cache('train.txt'),
-            self.cache('val.txt'),
-        ]):
-            return False
+        self._build_vocab(lines)
 
-        os.makedirs(self.cache(''), exist_ok=True)
+        source = file_hash(self.fname)
+        lines = open_cache(self._cache, lines, source)
+        if lines is None:
+            return
+        print(f'Adding {len(lines)} new samples to {self._cache}')
 
-        with open(self.fname, encoding='utf-8') as f:
-            data = [l.strip().split()[1] for l in f]
-        print(f'Loaded {len(data)} samples')
-
-        random.shuffle(data)
-        val_partition = data[:int(0.02 * len(data))]
-        train_partition = data[len(val_partition):]
+        with open(self.cache('vocab.txt'), 'w', encoding='utf-8') as f:
+            f.write(' '.join(self.vocab))
+        self._make_tensors(lines)
+        close_cache(self._cache, lines, source)
 
+    def _build_vocab(self, lines):
         charset = set()
-        for word in train_partition + val_partition:
-            charset.update(word)
-        charset.remove('\u0301')
+        for l in lines:
+            charset.update(l.split()[1])
+        charset.discard('\u0301')
         vocab = ['<pad>'] + sorted(charset)
         print(f'Vocab length: {len(vocab)}')
 
-        with open(self.cache('vocab.txt'), 'w', encoding='utf-8') as f:
-            f.write(' '.join(vocab))
-
-        with open(self.cache('train.txt'), 'w', encoding='utf-8') as f:
-            for x in train_partition:
-                f.write(f'{x}\n')
-        with open(self.cache('val.txt'), 'w', encoding='utf-8') as f:
-            for x in val_partition:
-                f.write(f'{x}\n')
-
-        return True
-
-    def _make_tensors(self, force=False):
+        self.vocab = { c: i for i,c in enumerate(vocab) }
+        self._cache = cache_dir(self._name, self.fname, self.max_len, vocab)
 
-        with open(self.cache('vocab.txt'), encoding='utf-8') as f:
-            chars = f.read().strip().split()
-        self.vocab = { c: i for i,c in enumerate(chars) }
-        print(f'Loaded vocab of size {len(self.vocab)}')
-
-        if not force and \
-                os.path.isfile(self.cache('dataset_train.pth')) and \
-                os.path.isfile(self.cache('dataset_val.pth')):
-            return False
+    def _make_tensors(self, lines):
+        data = [l.split()[1] for l in lines]
+        for x in data:
+            if len(x.replace('\u0301', '')) > self.max_len:
+                raise RuntimeError(f'Sample too long: {x}')
 
-        with open(self.cache('train.txt'), encoding='utf-8') as f:
-            train_data = [l.strip() for l in f]
-        print(f'Loaded {len(train_data)} train samples')
+        train_data = [x for x in data if not is_val(x.replace('\u0301', ''))]
+        val_data = [x for x in data if is_val(x.replace('\u0301', ''))]
 
-        with open(self.cache('val.txt'), encoding='utf-8') as f:
-            val_data = [l.strip() for l in f]
-        print(f'Loaded {len(val_data)} val samples')
-
-        for x in train_data + val_data:
-            if len(x) > self.max_len:
-                raise RuntimeError(f'Sample too long: {x}')
+        encoder = Encoder(self.vocab, max_len=self.max_len, accents='\u0301')
 
         def mk_tensors(dataset):
-            dataset_in  = torch.zeros( (len(dataset), self.max_len), dtype=torch.long)
-            dataset_out  = torch.zeros( (len(dataset), self.max_len), dtype=torch.long)
-            dataset_len = torch.zeros( (len(dataset),), dtype=torch.long)
-
-            count = 0
-            for word in dataset:
-                if '\u0301' in word:
-                    ai = word.index('\u0301') - 1
-                    word = word.replace('\u0301', '')
-                else:
-                    ai = -1
-                dataset_len[count] = len(word)
-                dataset_in[count, :len(word)] = torch.tensor([
-                    self.vocab[x] for x in word
-                ], dtype=torch.long)
-                if ai >= 0:
-                    dataset_out[count, ai] = 1
-
-                count += 1
-                if count % 10_000 == 0:
-                    print(count)
-            print(count)
+            # whole partition is encoded at once, accent marks become the targets
+            dataset_in, dataset_len, dataset_out = encoder(dataset)
+            # first accent only, -1 if none
+            ai = np.where(dataset_out.any(axis=1), dataset_out.argmax(axis=1), -1)
+            print(len(dataset))
             return {
-                'in': dataset_in,
-                'out': dataset_out,
-                'len': dataset_len,
+                'in': indices(dataset_in, self.vocab_size),
+                'out': positions(ai),
+                'len': indices(dataset_len, self.vocab_size),
             }
 
-        train = mk_tensors(train_data)
-        val   = mk_tensors(val_data)
-
-        torch.save(train, self.cache('dataset_train.pth'))
-        torch.save(val, self.cache('dataset_val.pth'))
-
-        return True
+        for name, dataset in [('train', train_data), ('val', val_data)]:
+            with open(self.cache(f'{name}.txt'), 'a', encoding='utf-8') as f:
+                for x in dataset:
+                    f.write(f'{x}\n')
+            append_arrays(self.cache(name), **mk_tensors(dataset))
 
     def setup(self, stage=None):
-        self.train_data = Dataset(torch.load(self.cache('dataset_train.pth')))
-        self.val_data = Dataset(torch.load(self.cache('dataset_val.pth')))
+        self.train_data = Dataset(load_arrays(self.cache('train'), Dataset.ARRAYS))
+        self.val_data = Dataset(load_arrays(self.cache('val'), Dataset.ARRAYS))
 
     def train_dataloader(self):
-        return torch.utils.data.DataLoader(self.train_data, batch_size=self.batch_size, shuffle=True)
+        return batch_loader(self.train_data, self.batch_size, shuffle=True, prefetch=self.prefetch,
+            buckets=self.train_data.buckets if self.bucket else None)
 
     def val_dataloader(self):
-        return torch.utils.data.DataLoader(self.val_data, batch_size=self.batch_size, shuffle=True)
+        return batch_loader(self.val_data, self.batch_size, shuffle=True, prefetch=self.prefetch,
+            buckets=self.val_data.buckets if self.bucket else None)
 
     @property
     def vocab_size(self):
         return len(self.vocab)
 
 class Dataset:
+    '''
+    Memory-mapped compact arrays (see translator.dataset_cache), expanded to int64 tensors
+    per batch. `out` is stored as accent position and expanded to one-hot.
+    '''
+    ARRAYS = ('in', 'out', 'len')
+
     def __init__(self, datum):
         self.in_ = datum['in']
         self.out = datum['out']
         self.len = datum['len']
 
+    @property
+    def buckets(self):
+        '''
+        Padded length of every sample for bucketing (see translator.batching)
+        '''
+        return padded_lengths(self.len, max_len=self.in_.shape[1])
+
     def __len__(self):
         return self.in_.shape[0]
 
     def __getitem__(self, i):
+        '''
+        i is a sample index, or a list of indices (then all tensors get the batch dimension)
+        '''
         return {
-            'in': self.in_[i],
-            'out': self.out[i],
-            'len': self.len[i],
+            'in': expand(self.in_[i]),
+            'out': one_hot(self.out[i], self.in_.shape[1]),
+            'len': expand(self.len[i]),
         }
 
 
@@ -0,0 +1,149 @@
+'''
+In-graph accent decision for the accent models.
+
+Accent models output [B, S, 2] logits, and every client computes the accent position
+from them. `add_decision` appends this computation to the graph, so that the model
+outputs one accent index (int32) and one confidence value per word:
+
+    accent:     [B] int32, position of the accented character, -1 for no accent
+    confidence: [B] float, logit margin (logits[..., 1] - logits[..., 0]) at the accent
+                position (at the most confident position if there is no accent)
+
+Padding positions (input 0) are never chosen.
+'''
+import os
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+from onnx import TensorProto, helper, numpy_helper
+
+
+def random_inputs(model, batch_size, seq_len, seed=0):
+    '''
+    Random int32 [batch_size, seq_len] inputs, within the size of the embedding tables they index
+    '''
+    rng = np.random.default_rng(seed)
+    initializers = {x.name: x for x in model.graph.initializer}
+    feed = {}
+    for x in model.graph.input:
+        names = {x.name}
+        size = 1
+        for node in model.graph.node:
+            if node.op_type == 'Cast' and node.input[0] in names:
+                names.update(node.output)
+            elif node.op_type == 'Gather' and node.input[1] in names and node.input[0] in initializers:
+                size = initializers[node.input[0]].dims[0]
+        # fixed axes of the model input win over the requested sizes
+        shape = [d.dim_value or n for d, n in zip(x.type.tensor_type.shape.dim, (batch_size, seq_len))]
+        feed[x.name] = rng.integers(0, size, shape).astype(np.int32)
+    return feed
+
+def decision_filename(onnx_filename):
+    root, ext = os.path.splitext(onnx_filename)
+    return f'{root}-decision{ext}'
+
+def add_decision(model, *, first=False):
+    '''
+    Replaces `logits` output of the ONNX model with `accent` and `confidence` (in place).
+
+    first: if True, accent goes on the first position where the margin is positive
+        (model-accent.onnx, ui-accent), otherwise on the position with the largest
+        margin (model-accentru.onnx, ui-accentru)
+    '''
+    graph = model.graph
+    assert [x.name for x in graph.output] == ['logits'], [x.name for x in graph.output]
+    inputs = graph.input[0].name
+
+    graph.initializer.extend([
+        numpy_helper.from_array(np.array(-1.e9, dtype=np.float32), 'decision_padding'),
+        numpy_helper.from_array(np.array(0, dtype=np.int32), 'decision_zero'),
+    ])
+    nodes = [
+        # margin, with padding positions masked out
+        helper.make_node('Slice', ['logits'], ['decision_no'], axes=[2], starts=[0], ends=[1]),
+        helper.make_node('Slice', ['logits'], ['decision_yes'], axes=[2], starts=[1], ends=[2]),
+        helper.make_node('Sub', ['decision_yes', 'decision_no'], ['decision_margin0']),
+        helper.make_node('Squeeze', ['decision_margin0'], ['decision_margin1'], axes=[2]),
+        helper.make_node('Cast', [inputs], ['decision_inputs'], to=TensorProto.INT32),
+        helper.make_node('Equal', ['decision_inputs', 'decision_zero'], ['decision_is_padding']),
+        helper.make_node('Where', ['decision_is_padding', 'decision_padding', 'decision_margin1'], ['decision_margin']),
+        helper.make_node('ReduceMax', ['decision_margin'], ['decision_best'], axes=[1], keepdims=0),
+    ]
+    if not first:
+        nodes.extend([
+            helper.make_node('ArgMax', ['decision_margin'], ['decision_index'], axis=1, keepdims=0),
+            helper.make_node('Identity', ['decision_best'], ['confidence']),
+        ])
+    else:
+        graph.initializer.extend([
+            numpy_helper.from_array(np.array(0., dtype=np.float32), 'decision_zero_float'),
+            numpy_helper.from_array(np.array([-1], dtype=np.int64), 'decision_none'),
+            numpy_helper.from_array(np.array([0., 1.], dtype=np.float32), 'decision_onehot_values'),
+            numpy_helper.from_array(np.array(1, dtype=np.int64), 'decision_seq_axis'),
+        ])
+        nodes.extend([
+            helper.make_node('Greater', ['decision_margin', 'decision_zero_float'], ['decision_positive0']),
+            helper.make_node('Cast', ['decision_positive0'], ['decision_positive'], to=TensorProto.FLOAT),
+            helper.make_node('ArgMax', ['decision_positive'], ['decision_first'], axis=1, keepdims=0),
+            helper.make_node('Greater', ['decision_best', 'decision_zero_float'], ['decision_found']),
+            helper.make_node('Where', ['decision_found', 'decision_first', 'decision_none'], ['decision_index']),
+            # margin at the first positive position
+            helper.make_node('Shape', ['decision_margin'], ['decision_shape']),
+            helper.make_node('Gather', ['decision_shape', 'decision_seq_axis'], ['decision_depth'], axis=0),
+            helper.make_node('OneHot', ['decision_first', 'decision_depth', 'decision_onehot_values'], ['decision_onehot'], axis=-1),
+            helper.make_node('Mul', ['decision_onehot', 'decision_margin'], ['decision_picked']),
+            helper.make_node('ReduceSum', ['decision_picked'], ['decision_first_margin'], axes=[1], keepdims=0),
+            helper.make_node('Where', ['decision_found', 'decision_first_margin', 'decision_best'], ['confidence']),
+        ])
+    nodes.append(helper.make_node('Cast', ['decision_index'], ['accent'], to=TensorProto.INT32))
+    graph.node.extend(nodes)
+
+    del graph.output[:]
+    graph.output.extend([
+        helper.make_tensor_value_info('accent', TensorProto.INT32, ['batch_size']),
+        helper.make_tensor_value_info('confidence', TensorProto.FLOAT, ['batch_size']),
+    ])
+
+def decide(logits, lengths, *, first=False):
+    '''
+    Same as the in-graph decision, on logits: returns (accent, confidence) arrays
+    '''
+    margin = logits[:, :, 1] - logits[:, :, 0]
+    margin[np.arange(logits.shape[1])[None, :] >= lengths[:, None]] = -1.e9
+    best = margin.max(axis=1)
+    if not first:
+        return margin.argmax(axis=1).astype(np.int32), best
+    positive = margin > 0
+    found = positive.any(axis=1)
+    index = np.where(found, positive.argmax(axis=1), -1).astype(np.int32)
+    confidence = np.where(found, margin[np.arange(len(margin)), positive.argmax(axis=1)], best)
+    return index, confidence
+
+def make_decision(onnx_filename, decision=None, *, first=False):
+    '''
+    Creates variant of the model with in-graph accent decision and checks it against
+    the decision computed from the logits on random inputs. Returns its file name.
+    '''
+    decision = decision or decision_filename(onnx_filename)
+
+    model = onnx.load(onnx_filename)
+    add_decision(model, first=first)
+    onnx.checker.check_model(model)
+    onnx.save(model, decision)
+
+    original = ort.InferenceSession(onnx_filename)
+    session = ort.InferenceSession(decision)
+    for batch_size, seq_len in [(1, 32), (7, 5), (64, 32)]:
+        feed = random_inputs(model, batch_size, seq_len)
+        # random words of random length
+        inputs = np.maximum(feed[model.graph.input[0].name], 1)
+        lengths = np.random.default_rng(batch_size).integers(1, inputs.shape[1] + 1, inputs.shape[0])
+        inputs[np.arange(inputs.shape[1])[None, :] >= lengths[:, None]] = 0
+        feed[model.graph.input[0].name] = inputs
+        accent, confidence = session.run(None, feed)
+        expected_accent, expected_confidence = decide(original.run(None, feed)[0], lengths, first=first)
+        assert (accent == expected_accent).all()
+        assert np.allclose(confidence, expected_confidence, atol=1.e-4)
+    print(f'Saved model with in-graph accent decision as {decision}')
+    return decision
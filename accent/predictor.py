@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+
+from translator.batching import groups, sequence_length
+from translator.encoder import Encoder
+from translator.session import create_session
+
+
+class Predictor:
+    '''
+    Puts accents on civic words (Python counterpart of ui-accent/src/predictor.js).
+
+    Words with explicit accent (\u0301 or "'") and words with a single vowel are
+    left as is. The rest are looked up in the cheat map (accents of the corpus words),
+    and all misses go through the model in a single run.
+    '''
+    RE = "[абвгдежзийклмнопрстуфхцчшщьыъэюя'\u0301]+"
+
+    def __init__(self, onnx_model, vocab, data_dict, *, threads=None):
+        self._ml_predictor = MLPredictor(onnx_model, vocab, threads=threads)
+        self._vocab_predictor = VocabPredictor(data_dict)
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        out = list(words)
+        misses = []
+        for i,word in enumerate(words):
+            word = word.replace("'", '\u0301')
+            out[i] = word
+            if '\u0301' in word or num_vowels(word) < 2:
+                continue
+            prediction = self._vocab_predictor(word)
+            if prediction is None:
+                misses.append(i)
+            else:
+                out[i] = prediction
+
+        for i, prediction in zip(misses, self._ml_predictor.batch([words[i] for i in misses])):
+            out[i] = prediction
+        return out
+
+class MLPredictor:
+    '''
+    Puts accent on civic words with model-accent.onnx
+    '''
+    RE = '[абвгдежзийклмнопрстуфхцчшщьыъэюя]+'
+
+    def __init__(self, onnx_model, vocab, *, threads=None):
+        self._session = create_session(onnx_model, threads=threads)
+        self._seq_len = sequence_length(self._session)
+
+        with open(vocab) as f:
+            self._vocab = json.load(f)
+        self._encoder = Encoder(self._vocab, replace={'э': 'е'})
+        # model exported with in-graph accent decision (accent.decision) outputs accent index per word
+        self._decision = 'accent' in [x.name for x in self._session.get_outputs()]
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        if not words:
+            return []
+
+        inputs, lengths, _ = self._encoder(words)
+        return [put_accent(word, accent) for word, accent in zip(words, self.indices(inputs, lengths).tolist())]
+
+    def indices(self, inputs, lengths):
+        '''
+        Accent index of every encoded word: [B] int64, -1 if the model puts no accent
+        '''
+        out = np.full((len(lengths),), -1, dtype=np.int64)
+        for seq_len, rows in groups(lengths, self._seq_len):
+            if self._decision:
+                out[rows] = self._session.run(['accent'], {
+                    'inputs': inputs[rows, :seq_len],
+                })[0]
+                continue
+            logits = self._session.run(None, {
+                'inputs': inputs[rows, :seq_len],
+            })[0]
+            out[rows] = first_accent(logits, lengths[rows])
+        return out
+
+def first_accent(logits, lengths):
+    '''
+    Accent goes on the first character where the model says "yes": [B] int64, -1 if there is none
+    '''
+    yes = (logits[:, :, 1] > logits[:, :, 0]) & (np.arange(logits.shape[1])[None, :] < np.asarray(lengths)[:, None])
+    return np.where(yes.any(axis=1), yes.argmax(axis=1), -1)
+
+def put_accent(word, accent):
+    if accent < 0:
+        return word
+    return word[:accent + 1] + '\u0301' + word[accent + 1:]
+
+VOWELS = 'аеиоуыэюя'
+
+def num_vowels(word):
+    return sum(c in VOWELS for c in word.lower())
+
+class VocabPredictor:
+    '''
+    Cheat map: accent positions of the words from the corpus (cu-words-civic-dedup-accent.txt)
+    '''
+    def __init__(self, data_dict):
+        self._data = {}
+        with open(data_dict, encoding='utf-8') as f:
+            for line in f:
+                ru, nk = (line.strip().split('\t') + [''])[:2]
+                accent = nk.find('\u0301')
+                if accent > 0:
+                    self._data[ru] = accent - 1  # accented character index
+        print(f'Loaded {len(self._data)} cheat map entries')
+
+    def __call__(self, word):
+        accent = self.index(word)
+        if accent is None:
+            return None
+        return put_accent(word, accent)
+
+    def index(self, word):
+        '''
+        Index of the accented character, or None if word is not in the cheat map
+        '''
+        return self._data.get(word.lower())
+
+def sample(onnx_model, vocab, data, words=['лепота', 'несть', 'Господи', 'помилуй', "ми'лость", 'ПОМИЛУЙ']):
+    predictor = Predictor(onnx_model, vocab, data)
+    for word, predicted in zip(words, predictor.batch(words)):
+        print(word, '==>', predicted)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Predicts accents of civic words')
+    parser.add_argument('-m', '--model', default='model-accent.onnx', help='File name of the model ONNX file')
+    parser.add_argument('-v', '--vocab', default='vocab-accent.json', help='File name of the vocab JSON file')
+    parser.add_argument('-d', '--data',  default='data/cu-words-civic-dedup-accent.txt', help='File name of the cheat map file (civic words with accents)')
+
+    args = parser.parse_args()
+
+    sample(args.model, args.vocab, args.data)
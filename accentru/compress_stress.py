@@ -1,25 +1,91 @@
+'''
+Compresses train stress dictionary by removing words that model predicts correctly.
+
+Model predictions are saved in a per-model cache (keyed by the hash of the model and
+vocab files) after every shard. Interrupted run resumes from the last completed shard,
+and re-runs with the same model evaluate only the words that are not in the cache yet.
+Shards are processed in parallel by a pool of worker processes.
+'''
+import functools
+import hashlib
+import os
+
+from translator.bulk import bulk
+
 from .predictor import MLPredictor
 
-def compress_stress(onnx_model, vocab, data, data_compressed):
+BATCH_SIZE = 256
+SHARD_SIZE = 10_000
+CACHE_DIR = os.path.expanduser('~/.cache/compress_stress')
+
+
+def compress_stress(onnx_model, vocab, data, data_compressed, batch_size=BATCH_SIZE, *,
+        workers=None, shard_size=SHARD_SIZE, cache_dir=CACHE_DIR):
 
-    predictor = MLPredictor(onnx_model, vocab)
     with open(data, encoding='utf-8') as f:
-        words = [l.strip() for l in f if l.strip()]
+        entries = [l.strip() for l in f if l.strip()]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, model_hash(onnx_model, vocab) + '.txt')
+    predictions = load_predictions(cache_file)
+
+    words = [
+        word for word in dict.fromkeys(entry.replace('\u0301', '') for entry in entries)
+        if word not in predictions
+    ]
+    print(f'{len(entries)} dictionary words, {len(words)} not in {cache_file}')
+
+    shards = [words[i:i + shard_size] for i in range(0, len(words), shard_size)]
+    make_predictor = functools.partial(MLPredictor, onnx_model, vocab)
+    process = functools.partial(predict_shard, batch_size=batch_size)
 
-    mistakes = []
     count = 0
-    for word in words:
-        count += 1
-        if count % 1000 == 0:
-            print(count, '/', len(words), round(len(mistakes) / count, 3))
-        predicted = predictor(word.replace('\u0301', ''))
-        if predicted != word:
-            mistakes.append(word)
-            print(word, '==>', predicted)
-
-    with open(data_compressed, 'w') as f:
+    with open(cache_file, 'a', encoding='utf-8') as cache:
+        for shard, predicted in zip(shards, bulk(make_predictor, process, shards, workers=workers)):
+            for word, prediction in zip(shard, predicted):
+                predictions[word] = prediction
+                cache.write(f'{word}\t{prediction}\n')
+            # checkpoint: completed shard survives interruption
+            cache.flush()
+            os.fsync(cache.fileno())
+            count += len(shard)
+            print(count, '/', len(words))
+
+    mistakes = [entry for entry in entries if predictions[entry.replace('\u0301', '')] != entry]
+    print(len(mistakes), '/', len(entries), round(len(mistakes) / max(1, len(entries)), 3))
+
+    with open(data_compressed + '.tmp', 'w', encoding='utf-8') as f:
         for word in mistakes:
             f.write(word + '\n')
+    os.replace(data_compressed + '.tmp', data_compressed)
+
+def predict_shard(predictor, words, batch_size=BATCH_SIZE):
+    out = []
+    for i in range(0, len(words), batch_size):
+        out.extend(predictor.batch(words[i:i + batch_size]))
+    return out
+
+def model_hash(*filenames):
+    h = hashlib.sha256()
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+    return h.hexdigest()[:16]
+
+def load_predictions(cache_file):
+    if not os.path.isfile(cache_file):
+        return {}
+
+    with open(cache_file, encoding='utf-8', newline='') as f:
+        text = f.read()
+    # drop incomplete last line, left by interrupted write
+    if not text.endswith('\n'):
+        text = text[:text.rfind('\n') + 1]
+        with open(cache_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    return dict(l.split('\t') for l in text.splitlines())
 
 if __name__ == '__main__':
     import argparse
@@ -29,7 +95,15 @@ if __name__ == '__main__':
     parser.add_argument('-v', '--vocab', default='vocab-accentru.json', help='File name of the vocab JSON file')
     parser.add_argument('-d', '--data',  default='data/ru_stress.txt', help='File name of the stress file')
     parser.add_argument('-o', '--out',   default='data/ru_stress_compressed.txt', help='File name of the output compressed stress file')
+    parser.add_argument('-b', '--batch-size', type=int, default=BATCH_SIZE, help=f'Number of words in one model run (default is {BATCH_SIZE})')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes (default is number of cores)')
+    parser.add_argument('-s', '--shard-size', type=int, default=SHARD_SIZE, help=f'Number of words in one shard (checkpoint) (default is {SHARD_SIZE})')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f'Directory of the per-model prediction cache (default is {CACHE_DIR})')
 
     args = parser.parse_args()
 
-    compress_stress(args.model, args.vocab, args.data, args.out)
\ No newline at end of file
+    compress_stress(args.model, args.vocab, args.data, args.out, args.batch_size,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        cache_dir=args.cache_dir,
+    )
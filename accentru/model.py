@@ -2,6 +2,9 @@ import lightning as L
 import torch
 import torch.nn.functional as F
 
+from translator.batching import padded_length
+from translator.conv_encoder import make_encoder
+
 
 class Model(L.LightningModule):
 
@@ -9,15 +12,17 @@ class Model(L.LightningModule):
         emb_dim=64,
         hidden_dim=128,
         dropout=0.1,
+        encoder='gru',
     ):
         super().__init__()
         self.vocab_size = vocab_size
         self.max_seq_len = max_seq_len
         self.emb_dim = emb_dim
         self.hidden_dim = hidden_dim
+        self.encoder = encoder
 
         self.embed = torch.nn.Embedding(self.vocab_size, self.emb_dim)
-        self.lstm = torch.nn.GRU(self.emb_dim, self.hidden_dim, bidirectional=True, batch_first=True, num_layers=3, dropout=dropout)
+        self.lstm = make_encoder(encoder, self.emb_dim, self.hidden_dim, dropout=dropout)  # GRU or ConvEncoder
 
         self.ff1 = torch.nn.Linear(self.hidden_dim * 2, self.hidden_dim * 4)
         self.dropout = torch.nn.Dropout(dropout)
@@ -40,17 +45,21 @@ class Model(L.LightningModule):
         x = F.log_softmax(x, dim=-1)
         return x
 
-    def training_step(self, batch, batch_idx):
-        logits = self.forward(batch['in'], batch['len'])
+    def _step(self, batch):
+        # batch holds words of one padded length (see translator.batching) and is trimmed to
+        # it, so every word is padded as at inference. Targets stay aligned with the positions
+        seq_len = padded_length(int(batch['len'].max()), max_len=batch['in'].shape[1])
+        logits = self.forward(batch['in'][:, :seq_len], batch['len'])
         logits = logits.transpose(1, 2)
-        loss = self.loss(logits, batch['out'])
+        return self.loss(logits, batch['out'][:, :seq_len])
+
+    def training_step(self, batch, batch_idx):
+        loss = self._step(batch)
         self.log('train_loss', loss, prog_bar=True)
         return loss
 
     def validation_step(self, batch, batch_idx):
-        logits = self.forward(batch['in'], batch['len'])
-        logits = logits.transpose(1, 2)
-        loss = self.loss(logits, batch['out'])
+        loss = self._step(batch)
         self.log('val_loss', loss, prog_bar=True)
 
     def configure_optimizers(self):
@@ -2,11 +2,16 @@ import json
 
 import numpy as np
 import onnx
-import onnxruntime as ort
 import torch
 
+from accent.decision import make_decision
 from accent.model import Model
 from accentru.accentru_dataset import AccentruDataset
+from accentru.review import review
+from translator.batching import run_buckets
+from translator.encoder import Encoder
+from translator.quantize import print_review, quantize_and_review, review_models
+from translator.session import create_session
 
 datamodule = AccentruDataset()
 datamodule.prepare_data()
@@ -14,12 +19,13 @@ datamodule.setup()
 
 vocab = datamodule.vocab
 
-def to_onnx(model_checkpoint='model-accentru.ckpt', onnx_filename='model-accentru.onnx'):
+def to_onnx(model_checkpoint='model-accentru.ckpt', onnx_filename='model-accentru.onnx', encoder='gru'):
 
     model = Model.load_from_checkpoint(
         model_checkpoint    ,
         vocab_size=datamodule.vocab_size,
         max_seq_len=32,
+        encoder=encoder,
     )
 
     model.eval()
@@ -36,8 +42,8 @@ def to_onnx(model_checkpoint='model-accentru.ckpt', onnx_filename='model-accentr
         input_names = ('inputs',),
         output_names = ('logits',),
         dynamic_axes = {
-            'inputs' : { 0: 'batch_size' },
-            'logits' : { 0: 'batch_size' },
+            'inputs' : { 0: 'batch_size', 1: 'seq_len' },
+            'logits' : { 0: 'batch_size', 1: 'seq_len' },
         }
     )
 
@@ -58,12 +64,9 @@ def to_onnx(model_checkpoint='model-accentru.ckpt', onnx_filename='model-accentr
 
 def sample(onnx_model, words=['станок', 'перевязав', 'кровать', 'красота', 'здоровье', 'задница']):
 
-    session = ort.InferenceSession(onnx_model)
+    session = create_session(onnx_model, cache=False)
 
-    inputs = np.zeros((len(words), 32), dtype=np.int32)
-    for i,word in enumerate(words):
-        for j,c in enumerate(word):
-            inputs[i, j] = vocab[c]
+    inputs, _, _ = Encoder(vocab)(words)
 
     logits = session.run(None, {
         'inputs': inputs,
@@ -82,6 +85,19 @@ def sample(onnx_model, words=['станок', 'перевязав', 'крова
 
         print(word, accent)
 
+def evaluate(session):
+    def predict(in_, lens):
+        return session.run(None, {
+            'inputs': in_.numpy().astype(np.int32),
+        })[0]
+    return review(predict, datamodule, verbose=False)['error_rate']
+
+def evaluate_bucketed(session):
+    def predict(in_, lens):
+        return run_buckets(lambda x: session.run(None, {'inputs': x[0]})[0],
+            lens.numpy(), [in_.numpy().astype(np.int32)])
+    return review(predict, datamodule, verbose=False)['error_rate']
+
 
 if __name__ == '__main__':
     import argparse
@@ -89,9 +105,27 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Converts model to ONNX')
     parser.add_argument('-i', '--input', default='model-accentru.ckpt', help='Input file with Lightning checkpoint')
     parser.add_argument('-o', '--output', default='model-accentru.onnx', help='File name of the output ONNX file')
+    parser.add_argument('-q', '--quantize', action='store_true', help='Also create INT8 weight variant and compare it with the float model on the validation split')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='Max allowed increase of the error rate of the INT8 model (default is 0.005)')
+    parser.add_argument('--padding', action='store_true', help='Compare error rates with full 32 padding and with length buckets (as predictors run the model) on the validation split')
+    parser.add_argument('-d', '--decision', action='store_true', help='Also create a variant that outputs accent index and confidence per word instead of logits')
+    parser.add_argument('-a', '--encoder', choices=['gru', 'conv'], default='gru', help='Encoder architecture the model was trained with (default is "gru")')
+    parser.add_argument('--compare', metavar='ONNX', help='Compare latency and error rate with this model (e.g. the GRU one) on the validation split')
 
     args = parser.parse_args()
 
-    to_onnx(args.input, args.output)
+    to_onnx(args.input, args.output, args.encoder)
+
+    sample(args.output)
+
+    if args.compare:
+        print_review(['compared', args.encoder], review_models([args.compare, args.output], evaluate))
+
+    if args.decision:
+        make_decision(args.output, first=False)
+
+    if args.padding:
+        print_review(['full', 'bucketed'], review_models([args.output], evaluate) + review_models([args.output], evaluate_bucketed))
 
-    sample('model-accentru.onnx')
\ No newline at end of file
+    if args.quantize and not quantize_and_review(args.output, evaluate, args.tolerance):
+        parser.exit(1)
\ No newline at end of file
@@ -2,48 +2,86 @@ import json
 import re
 
 import numpy as np
-import onnxruntime as ort
+
+from translator.batching import groups, sequence_length
+from translator.cache import CachedPredictor
+from translator.encoder import Encoder
+from translator.session import create_session
 
 
 class Predictor:
     RE = "[абвгдеёжзийклмнопрстуфхцчшщьыъэюя'\u0301]+"
 
-    def __init__(self, onnx_model, vocab, data_dict):
-        self._ml_predictor = MLPredictor(onnx_model, vocab)
+    def __init__(self, onnx_model, vocab, data_dict, *, threads=None):
+        self._ml_predictor = MLPredictor(onnx_model, vocab, threads=threads)
         self._vocab_predictor = VocabPredictor(data_dict)
 
     def __call__(self, word):
-        if 'ё' in word.lower() or num_vowels(word) < 2:
-            return word
-        word = word.replace("'", '\u0301')
-        if '\u0301' in word:
-            return word
-        prediction = self._vocab_predictor(word)
-        if prediction is None:
-            prediction = self._ml_predictor(word)
-        return prediction
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        '''
+        Puts stress marks on a list of words. Dictionary misses are sent to the model in a single run.
+        '''
+        out = list(words)
+        misses = []
+        for i,word in enumerate(words):
+            if 'ё' in word.lower() or num_vowels(word) < 2:
+                continue
+            word = word.replace("'", '\u0301')
+            out[i] = word
+            if '\u0301' in word:
+                continue
+            prediction = self._vocab_predictor(word)
+            if prediction is None:
+                misses.append(i)
+            else:
+                out[i] = prediction
+
+        for i, prediction in zip(misses, self._ml_predictor.batch([words[i] for i in misses])):
+            out[i] = prediction
+        return out
 
 class MLPredictor:
 
-    def __init__(self, onnx_model, vocab):
-        self._session = ort.InferenceSession(onnx_model)
+    def __init__(self, onnx_model, vocab, *, threads=None):
+        self._session = create_session(onnx_model, threads=threads)
+        self._seq_len = sequence_length(self._session)
 
         with open(vocab) as f:
             self._vocab = json.load(f)
+        self._encoder = Encoder(self._vocab)
+        # model exported with in-graph accent decision (accent.decision) outputs accent index per word
+        self._decision = 'accent' in [x.name for x in self._session.get_outputs()]
 
     def __call__(self, word):
-        word_lower = word.lower()
-        inputs = np.zeros((1, 32), dtype=np.int32)
-        for j,c in enumerate(word[:32]):
-            inputs[0, j] = self._vocab[c.lower()]
-        logits = self._session.run(None, {
-            'inputs': inputs,
-        })[0][0]
-        accent = (logits[:len(word),1] - logits[:len(word), 0]).argmax()
-        word = list(word)
-        word.insert(accent + 1, '\u0301')
-        word = ''.join(word)
-        return word
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        if not words:
+            return []
+
+        inputs, lengths, _ = self._encoder(words)
+
+        accents = np.zeros((len(words),), dtype=np.int64)
+        for seq_len, rows in groups(lengths, self._seq_len):
+            if self._decision:
+                accents[rows] = self._session.run(['accent'], {
+                    'inputs': inputs[rows, :seq_len],
+                })[0]
+                continue
+            logits = self._session.run(None, {
+                'inputs': inputs[rows, :seq_len],
+            })[0]
+            # accent goes to the most confident position within the word
+            confidence = logits[:, :, 1] - logits[:, :, 0]
+            confidence[np.arange(seq_len)[None, :] >= lengths[rows, None]] = -np.inf
+            accents[rows] = confidence.argmax(axis=1)
+
+        return [
+            word[:accent + 1] + '\u0301' + word[accent + 1:]
+            for word, accent in zip(words, accents.tolist())
+        ]
 
 RE_VOWELS = '[уеыаоэюия]'
 RE_WORD = '^[абвгдеёжзийклмнопрстуфхцчшщьыъэюя]+$'
@@ -73,8 +111,10 @@ class VocabPredictor:
         word = ''.join(word)
         return word
 
-def sample(onnx_model, vocab, data, words=['станок', 'перевязав', 'КРОВАТИ', 'красота', 'здоровье', 'Задница', 'стрёмно', 'дети']):
+def sample(onnx_model, vocab, data, words=['станок', 'перевязав', 'КРОВАТИ', 'красота', 'здоровье', 'Задница', 'стрёмно', 'дети'], cache=None):
     predictor = Predictor(onnx_model, vocab, data)
+    if cache is not None:
+        predictor = CachedPredictor(predictor, filename=cache)
     for word in words:
         predicted = predictor(word)
         print(word, '==>', predicted)
@@ -82,16 +122,16 @@ def sample(onnx_model, vocab, data, words=['станок', 'перевязав',
     out_text = stress_text(predictor, '...гляжу -- поднимается медленно в гору лошадка везущая хворосту воз...')
     print(''.join(out_text))
 
+    if cache is not None:
+        print(predictor.stats())
+        predictor.close()
+
 def stress_text(predictor, text):
-    offset = 0
-    for mtc in re.finditer(Predictor.RE, text, flags=re.IGNORECASE):
-        s, e = mtc.span()
-        if offset < s:
-            yield text[offset:s]
-        yield predictor(text[s:e])
-        offset = e
-    if offset < len(text):
-        yield text[offset:]
+    pieces = re.split(f'({Predictor.RE})', text, flags=re.IGNORECASE)
+    pieces[1::2] = predictor.batch(pieces[1::2])
+    for piece in pieces:
+        if piece:
+            yield piece
 
 if __name__ == '__main__':
     import argparse
@@ -100,7 +140,8 @@ if __name__ == '__main__':
     parser.add_argument('-m', '--model', default='model-accentru.onnx', help='File name of the model ONNX file')
     parser.add_argument('-v', '--vocab', default='vocab-accentru.json', help='File name of the vocab JSON file')
     parser.add_argument('-d', '--data',  default='data/ru_stress_compressed.txt', help='File name of the stress dictionary file')
+    parser.add_argument('-c', '--cache', help='File name of the on-disk prediction cache (default is no disk cache)')
 
     args = parser.parse_args()
 
-    sample(args.model, args.vocab, args.data)
\ No newline at end of file
+    sample(args.model, args.vocab, args.data, cache=args.cache)
\ No newline at end of file
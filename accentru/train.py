@@ -6,12 +6,12 @@ from accent.model import Model
 from accentru.accentru_dataset import AccentruDataset
 
 
-def main(max_epochs=20, max_steps=4_000, max_chars=32, load_checkpoint=None, resume=False, save_checkpoint='model-accentru.ckpt'):
+def main(max_epochs=20, max_steps=4_000, max_chars=32, load_checkpoint=None, resume=False, save_checkpoint='model-accentru.ckpt', encoder='gru', prefetch=False, bucket=True):
 
-    datamodule = AccentruDataset()
+    datamodule = AccentruDataset(prefetch=prefetch, bucket=bucket)
     datamodule.prepare_data()
 
-    model = Model(datamodule.vocab_size, max_chars)
+    model = Model(datamodule.vocab_size, max_chars, encoder=encoder)
     if load_checkpoint is not None:
         if not resume:
             # here I load only model weights, but not optimizer state - because
@@ -20,7 +20,7 @@ def main(max_epochs=20, max_steps=4_000, max_chars=32, load_checkpoint=None, res
             x = torch.load(load_checkpoint)
             model.load_state_dict(x['state_dict'])
         else:
-            model = Model.load_from_checkpoint(load_checkpoint, vocab_size=datamodule.vocab_size, max_seq_len=max_chars)
+            model = Model.load_from_checkpoint(load_checkpoint, vocab_size=datamodule.vocab_size, max_seq_len=max_chars, encoder=encoder)
 
     trainer = L.Trainer(
         max_epochs=max_epochs,
@@ -44,6 +44,9 @@ if __name__ == '__main__':
     parser.add_argument('-l', '--load', help='Load a checkpoint')
     parser.add_argument('-r', '--resume', action='store_true', help='Resume training (restore model AND optimizer state)')
     parser.add_argument('-s', '--save', default='model-accentru.ckpt', help='Save trained model as (default is "model.ckpt")')
+    parser.add_argument('-a', '--encoder', choices=['gru', 'conv'], default='gru', help='Encoder architecture: recurrent (GRU) or dilated convolutions (default is "gru")')
+    parser.add_argument('-p', '--prefetch', action='store_true', help='Prepare next batches on a background thread')
+    parser.add_argument('--no-bucket', action='store_true', help='Draw random batches instead of length-bucketed ones')
 
     args = parser.parse_args()
 
@@ -54,4 +57,7 @@ if __name__ == '__main__':
         load_checkpoint=args.load,
         resume=args.resume,
         save_checkpoint=args.save,
+        encoder=args.encoder,
+        prefetch=args.prefetch,
+        bucket=not args.no_bucket,
     ))
@@ -0,0 +1,131 @@
+import lightning as L
+import torch
+import torch.nn.functional as F
+
+from translator.batching import padded_length
+
+
+class Model(L.LightningModule):
+    '''
+    Translator and accent model with one shared encoder.
+
+    The encoder (3-layer bidirectional GRU) runs over the civic characters once. The accent
+    head predicts accent position from the encoder output. The translator head adds accent
+    hint to the encoder output, upsamples it 2x and runs one more (single layer) GRU before
+    the CTC classifier.
+    '''
+
+    def __init__(self, vocab_size, max_seq_len, *,
+        emb_dim=64,
+        hidden_dim=128,
+        dropout=0.1,
+        accent_weight=1.0,
+    ):
+        super().__init__()
+        self.vocab_size = vocab_size
+        self.max_seq_len = max_seq_len
+        self.emb_dim = emb_dim
+        self.hidden_dim = hidden_dim
+        self.accent_weight = accent_weight
+
+        self.embed = torch.nn.Embedding(self.vocab_size, self.emb_dim)
+        self.lstm = torch.nn.GRU(self.emb_dim, self.hidden_dim, bidirectional=True, batch_first=True, num_layers=3, dropout=dropout)
+        self.dropout = torch.nn.Dropout(dropout)
+
+        # accent head
+        self.accent_ff1 = torch.nn.Linear(self.hidden_dim * 2, self.hidden_dim * 4)
+        self.accent_ff2 = torch.nn.Linear(self.hidden_dim * 4, 2)
+
+        # translator head
+        self.embed_accent = torch.nn.Embedding(2, self.hidden_dim * 2)  # just yes/no
+        self.upsample = torch.nn.Upsample(scale_factor=2, mode='nearest')
+        self.decoder = torch.nn.GRU(self.hidden_dim * 2, self.hidden_dim, bidirectional=True, batch_first=True)
+        self.ff1 = torch.nn.Linear(self.hidden_dim * 2, self.hidden_dim * 4)
+        self.ff2 = torch.nn.Linear(self.hidden_dim * 4, self.vocab_size)
+
+        self.loss = torch.nn.CTCLoss()
+        self.accent_loss = torch.nn.NLLLoss()  # words with unknown accent are marked with -100 (ignored)
+
+    def forward(self, x, a, lengths=None):
+        '''
+        x: batch of sequences: [B, S] int64
+        a: accent hints: [B, S] int64
+        lengths: [B] int64
+
+        Returns translator logits [B, 2S, V] and accent logits [B, S, 2] (both log-softmax)
+        '''
+        x = self.encode(x)
+        return self.translate(x, a), self.accent(x)
+
+    def predict(self, x, a):
+        '''
+        Same as forward, but words without accent hint get the hint from the accent head.
+        This is what exported model does.
+        '''
+        h = self.encode(x)
+        accent = self.accent(h)
+
+        # accent goes on the first character where the head says "yes" (as in accent.predictor)
+        yes = (accent[:, :, 1] > accent[:, :, 0]) & (x != 0)
+        predicted = F.one_hot(yes.long().argmax(dim=1), x.shape[1]).to(a.dtype)
+        predicted = predicted * yes.any(dim=1).to(a.dtype).unsqueeze(1)
+        hinted = a.sum(dim=1, keepdim=True) > 0
+        a = torch.where(hinted, a, predicted)
+
+        return self.translate(h, a), accent
+
+    def encode(self, x):
+        x = self.embed(x)  # [B, S, E]
+        x = self.dropout(x)
+        x, _ = self.lstm(x)  # [B, S, 2H]
+        return x
+
+    def accent(self, x):
+        x = self.accent_ff1(x)
+        x = F.relu(x)
+        x = self.dropout(x)
+        x = self.accent_ff2(x)  # [B, S, 2]
+        x = F.log_softmax(x, dim=-1)
+        return x
+
+    def translate(self, x, a):
+        x = x + self.embed_accent(a)  # [B, S, 2H]
+        x = self.upsample(x.transpose(1,2)).transpose(1,2)  # [B, 2S, 2H]
+        x, _ = self.decoder(x)
+        x = self.ff1(x)
+        x = F.relu(x)
+        x = self.dropout(x)
+        x = self.ff2(x)  # [B, 2S, V]
+        x = F.log_softmax(x, dim=-1)
+        return x
+
+    def _step(self, batch, prefix):
+        # batch holds words of one padded length (see translator.batching) and is trimmed to
+        # it, so every word is padded as at inference. Targets longer than that keep their
+        # length: 2 frames per position always fit a CTC path of the target
+        seq_len = max(padded_length(int(batch['ru_len'].max()), max_len=batch['ru'].shape[1]), int(batch['cu_len'].max()))
+        logits, accent_logits = self.forward(batch['ru'][:, :seq_len], batch['ru_acc'][:, :seq_len], batch['ru_len'])
+        logits = logits.transpose(0, 1)
+        input_lens = torch.full(size=(logits.shape[1],), fill_value=logits.shape[0], dtype=torch.long, device=logits.device)
+        translator_loss = self.loss(logits, batch['cu'][:, :seq_len], input_lens.detach(), batch['cu_len'].detach())
+        accent_loss = self.accent_loss(accent_logits.transpose(1, 2), batch['acc'][:, :seq_len])
+        loss = translator_loss + self.accent_weight * accent_loss
+        self.log(f'{prefix}_translator_loss', translator_loss)
+        self.log(f'{prefix}_accent_loss', accent_loss)
+        self.log(f'{prefix}_loss', loss, prog_bar=True)
+        return loss
+
+    def training_step(self, batch, batch_idx):
+        return self._step(batch, 'train')
+
+    def validation_step(self, batch, batch_idx):
+        self._step(batch, 'val')
+
+    def configure_optimizers(self):
+        opt = torch.optim.Adam(self.parameters(), lr=0.001)
+        sch = torch.optim.lr_scheduler.CyclicLR(opt, base_lr=0.0001, max_lr=0.005, step_size_up=1000, cycle_momentum=False)
+        return [opt], [{
+            'scheduler': sch,
+            'interval' : 'step',
+            'frequency': 1,
+        }]
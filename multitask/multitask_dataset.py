@@ -0,0 +1,97 @@
+import numpy as np
+
+from translator.dataset_cache import load_arrays, one_hot, positions, save_arrays
+from translator.translator_dataset import Dataset, TranslatorDataset
+
+
+class MultiTaskDataset(TranslatorDataset):
+    '''
+    Translator dataset with accent position targets for the accent head.
+
+    Accent target of a word comes from its accented form in the translator dictionary,
+    or from the accent dictionary. Words with unknown accent are ignored by accent loss.
+    '''
+
+    def __init__(self, *, fname='data/cu-words-civic-dedup.txt',
+            accent_fname='data/cu-words-civic-dedup-accent.txt',
+            max_len=32, batch_size=512, prefetch=False, bucket=True):
+        super().__init__(fname=fname, max_len=max_len, batch_size=batch_size, prefetch=prefetch, bucket=bucket)
+        self.accent_fname = accent_fname
+        self._name = 'multitask_dataset'
+
+    @property
+    def sources(self):
+        return [self.fname, self.accent_fname]
+
+    def _make_tensors(self, lines):
+        super()._make_tensors(lines)
+
+        # accent targets of all samples are re-computed (cheap), as accent file may have changed
+        accents = {}
+        with open(self.accent_fname, encoding='utf-8') as f:
+            for l in f:
+                pieces = l.split()
+                if len(pieces) < 2:
+                    continue
+                ru, nk = pieces[:2]
+                accent = nk.find('\u0301')
+                # no accent mark: word has no accent (-1), as in the accent dataset
+                accents[ru] = accent - 1 if accent >= 0 else -1
+
+        with open(self.cache('train.txt'), encoding='utf-8') as f:
+            train_data = [l.strip().split() for l in f]
+        with open(self.cache('val.txt'), encoding='utf-8') as f:
+            val_data = [l.strip().split() for l in f]
+
+        # accented form in the translator dictionary wins
+        for _, ru, astr in train_data + val_data:
+            if int(astr) >= 0:
+                accents[ru] = int(astr)
+
+        def mk_tensors(dataset):
+            # -100 is unknown accent, ignored by the loss
+            ai = np.array([accents.get(ru, -100) for _, ru, _ in dataset], dtype=np.int64)
+            print(len(dataset), (ai == -100).sum())
+            return positions(ai)
+
+        save_arrays(self.cache('train'), acc=mk_tensors(train_data))
+        save_arrays(self.cache('val'), acc=mk_tensors(val_data))
+
+    def setup(self, stage=None):
+        self.train_data = MultiTaskData(load_arrays(self.cache('train'), MultiTaskData.ARRAYS))
+        self.val_data = MultiTaskData(load_arrays(self.cache('val'), MultiTaskData.ARRAYS))
+
+class MultiTaskData(Dataset):
+    ARRAYS = Dataset.ARRAYS + ('acc',)
+
+    def __init__(self, datum):
+        super().__init__(datum)
+        self.acc = datum['acc']
+        assert self.acc.shape == self.ru_acc.shape
+
+    def __getitem__(self, i):
+        return dict(super().__getitem__(i), acc=one_hot(self.acc[i], self.ru.shape[1]))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='test-run MultiTask Dataset')
+    parser.add_argument('--max_len', type=int, default=32, help='max word length')
+    parser.add_argument('--batch_size', type=int, default=512, help='batch size')
+
+    args = parser.parse_args()
+
+    data = MultiTaskDataset(max_len=args.max_len, batch_size=args.batch_size)
+    data.prepare_data()
+    data.setup()
+
+    count = 0
+    for batch in data.train_dataloader():
+        count += 1
+    print(count)
+
+    count = 0
+    for batch in data.val_dataloader():
+        count += 1
+    print(count)
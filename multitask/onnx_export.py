@@ -0,0 +1,126 @@
+import json
+
+import numpy as np
+import onnx
+import torch
+
+from accent.predictor import first_accent, put_accent
+from multitask.model import Model
+from multitask.multitask_dataset import MultiTaskDataset
+from translator.batching import run_buckets
+from translator.ctc_decoder import CTCDecoder
+from translator.encoder import Encoder
+from translator.quantize import print_review, quantize_and_review, review_models
+from translator.review import review
+from translator.session import create_session
+
+datamodule = MultiTaskDataset()
+datamodule.prepare_data()
+datamodule.setup()
+
+vocab = datamodule.vocab
+
+class Exported(torch.nn.Module):
+    '''
+    Exported graph: words without accent hint get the hint from the accent head
+    '''
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x, a):
+        return self.model.predict(x.long(), a.long())
+
+def to_onnx(model_checkpoint='model-multitask.ckpt', onnx_filename='model-multitask.onnx'):
+
+    model = Model.load_from_checkpoint(
+        model_checkpoint,
+        vocab_size=datamodule.vocab_size,
+        max_seq_len=32,
+    )
+
+    model.eval()
+
+    inputs = torch.zeros((1, 32), dtype=torch.int32)
+    accents = torch.zeros((1, 32), dtype=torch.int32)
+    torch.onnx.export(
+        Exported(model),
+        (inputs, accents),
+        onnx_filename,
+
+        export_params=True,        # store the trained parameter weights inside the model file
+        opset_version=9,          # the ONNX version to export the model to
+        do_constant_folding=True,
+        input_names = ('inputs', 'accents'),
+        output_names = ('logits', 'accent_logits'),
+        dynamic_axes = {
+            'inputs' : { 0: 'batch_size', 1: 'seq_len' },
+            'accents': { 0: 'batch_size', 1: 'seq_len' },
+            'logits' : { 0: 'batch_size', 1: 'logits_len' },
+            'accent_logits' : { 0: 'batch_size', 1: 'seq_len' },
+        }
+    )
+
+    with open('vocab-multitask.json', 'w') as f:
+        json.dump(vocab, f)
+
+    # Check that the model is well formed
+    onnx.checker.check_model(onnx.load(onnx_filename))
+
+def sample(onnx_model, words=['лепота', 'несть', 'помилуй']):
+    session = create_session(onnx_model, cache=False)
+
+    inputs, lengths, accents = Encoder(vocab, accents=True, replace={'э': 'е'})(words)
+
+    # one run gives both translation and accent
+    logits, accent_logits = session.run(None, {
+        'inputs': inputs,
+        'accents': accents,
+    })
+
+    # specify alphabet labels as they appear in logits
+    labels = list(vocab.keys())
+    assert labels[0] == '<pad>'
+    labels[0] = ''
+
+    decoder = CTCDecoder(labels)
+
+    for word, accent, out in zip(words, first_accent(accent_logits, lengths).tolist(), decoder(logits)):
+        print(put_accent(word, accent), '==>', out)
+
+def evaluate(session):
+    def predict(ru, ru_acc, ru_len):
+        return session.run(None, {
+            'inputs': ru.numpy().astype(np.int32),
+            'accents': ru_acc.numpy().astype(np.int32),
+        })[0]
+    return review(predict, datamodule, verbose=False)['error_rate']
+
+def evaluate_bucketed(session):
+    def predict(ru, ru_acc, ru_len):
+        return run_buckets(lambda x: session.run(None, {'inputs': x[0], 'accents': x[1]})[0],
+            ru_len.numpy(), [ru.numpy().astype(np.int32), ru_acc.numpy().astype(np.int32)], blank=0)
+    return review(predict, datamodule, verbose=False)['error_rate']
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Converts multi-task model to ONNX')
+    parser.add_argument('-i', '--input', default='model-multitask.ckpt', help='Input file with Lightning checkpoint')
+    parser.add_argument('-o', '--output', default='model-multitask.onnx', help='File name of the output ONNX file')
+    parser.add_argument('-q', '--quantize', action='store_true', help='Also create INT8 weight variant and compare it with the float model on the validation split')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='Max allowed increase of the error rate of the INT8 model (default is 0.005)')
+    parser.add_argument('--padding', action='store_true', help='Compare error rates with full 32 padding and with length buckets (as predictors run the model) on the validation split')
+
+    args = parser.parse_args()
+
+    to_onnx(args.input, args.output)
+
+    sample(args.output)
+
+    if args.padding:
+        print_review(['full', 'bucketed'], review_models([args.output], evaluate) + review_models([args.output], evaluate_bucketed))
+
+    if args.quantize and not quantize_and_review(args.output, evaluate, args.tolerance):
+        parser.exit(1)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from accent.decision import decide, make_decision
+from accent.predictor import MLPredictor
+from accentru.predictor import MLPredictor as StressMLPredictor
+
+
+def test(tmp_path):
+    decision = make_decision('model-accent.onnx', str(tmp_path / 'model-accent-decision.onnx'), first=True)
+
+    words = ['лепота', 'помилуй', 'преподобне', 'а', 'эхо', 'а' * 40]
+    expected = MLPredictor('model-accent.onnx', 'vocab-accent.json').batch(words)
+    assert MLPredictor(decision, 'vocab-accent.json').batch(words) == expected
+
+
+def test01(tmp_path):
+    decision = make_decision('model-accentru.onnx', str(tmp_path / 'model-accentru-decision.onnx'))
+
+    words = ['станок', 'перевязав', 'кровать', 'красота', 'здоровье', 'а']
+    expected = StressMLPredictor('model-accentru.onnx', 'vocab-accentru.json').batch(words)
+    assert StressMLPredictor(decision, 'vocab-accentru.json').batch(words) == expected
+
+
+def test02():
+    logits = np.zeros((3, 4, 2), dtype=np.float32)
+    logits[0, :, 1] = [-1, 2, 3, 5]  # last position is padding
+    logits[1, :, 1] = [-1, -2, -3, -4]
+    logits[2, :, 1] = [-1, 1, 3, -4]
+    lengths = np.array([3, 4, 4])
+
+    accent, confidence = decide(logits.copy(), lengths)
+    assert accent.tolist() == [2, 0, 2]
+    assert confidence.tolist() == [3, -1, 3]
+
+    accent, confidence = decide(logits.copy(), lengths, first=True)
+    assert accent.tolist() == [1, -1, 1]
+    assert confidence.tolist() == [2, -1, 1]
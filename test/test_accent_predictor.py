@@ -0,0 +1,37 @@
+import numpy as np
+
+from accent.predictor import MLPredictor, Predictor, first_accent, put_accent
+
+
+def test(tmp_path):
+    data = tmp_path / 'cu-words-civic-dedup-accent.txt'
+    data.write_text('а\tа\t1951\nлепота\tлепо́та\t5\n', encoding='utf-8')
+    predictor = Predictor('model-accent.onnx', 'vocab-accent.json', str(data))
+
+    words = ['лепота', 'Лепота', 'несть', "ле'пота", 'ле́пота', 'помилуй', 'ГОСПОДИ', 'эхо']
+    result = predictor.batch(words)
+    assert result[:5] == ['лепо́та', 'Лепо́та', 'несть', 'ле́пота', 'ле́пота']
+    assert [x.count('\u0301') <= 1 for x in result] == [True] * len(words)
+    assert [x.replace('\u0301', '') for x in result[5:]] == words[5:]
+    assert result == [predictor(word) for word in words]
+
+
+def test01():
+    predictor = MLPredictor('model-accent.onnx', 'vocab-accent.json')
+
+    words = ['лепота', 'помилуй', 'преподобне', 'эхо', 'а' * 40]
+    result = predictor.batch(words)
+    assert [x.replace('\u0301', '') for x in result] == words
+    assert result == [predictor(word) for word in words]
+
+
+def test02():
+    logits = np.zeros((3, 4, 2), dtype=np.float32)
+    logits[0, :, 1] = [-1, 2, 3, 5]  # last position is padding
+    logits[1, :, 1] = [-1, -2, -3, -4]
+    logits[2, :, 1] = [-1, -1, -1, 4]
+    lengths = np.array([3, 4, 3])
+
+    assert first_accent(logits, lengths).tolist() == [1, -1, -1]
+    assert put_accent('аз', 0) == 'а\u0301з'
+    assert put_accent('аз', -1) == 'аз'
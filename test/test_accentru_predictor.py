@@ -0,0 +1,60 @@
+import os
+
+from accentru.compress_stress import compress_stress, load_predictions, model_hash
+from accentru.predictor import MLPredictor, Predictor
+
+
+def test(tmp_path):
+    data = tmp_path / 'ru_stress_compressed.txt'
+    data.write_text('красота́\n', encoding='utf-8')
+    predictor = Predictor('model-accentru.onnx', 'vocab-accentru.json', str(data))
+
+    words = ['Красота', 'ёлка', 'дом', "кра'сота", 'де́ти', 'перевязав', 'КРОВАТИ']
+    result = predictor.batch(words)
+    assert result[:5] == ['Красота́', 'ёлка', 'дом', 'кра́сота', 'де́ти']
+    assert [x.count('\u0301') for x in result] == [1, 0, 0, 1, 1, 1, 1]
+    assert result == [predictor(word) for word in words]
+
+
+def test01():
+    predictor = MLPredictor('model-accentru.onnx', 'vocab-accentru.json')
+
+    words = ['станок', 'перевязав', 'кровати', 'здоровье', 'водонепроницаемость', 'а' * 40]
+    result = predictor.batch(words)
+    assert [x.replace('\u0301', '') for x in result] == words
+    assert result == [predictor(word) for word in words]
+    assert predictor.batch([]) == []
+
+
+def move_accent(word):
+    i = word.index('\u0301')
+    word = word.replace('\u0301', '')
+    i = i % len(word)
+    return word[:i + 1] + '\u0301' + word[i + 1:]
+
+def test02(tmp_path):
+    predictor = MLPredictor('model-accentru.onnx', 'vocab-accentru.json')
+    right = predictor.batch(['станок', 'перевязав', 'кровати', 'здоровье', 'красота'])
+    wrong = [move_accent(word) for word in right]
+
+    data = tmp_path / 'ru_stress.txt'
+    data.write_text(''.join(x + '\n' for x in right[:3] + wrong[:3]), encoding='utf-8')
+    out = tmp_path / 'ru_stress_compressed.txt'
+    cache_dir = tmp_path / 'cache'
+    compress_stress('model-accentru.onnx', 'vocab-accentru.json', str(data), str(out),
+        batch_size=2, workers=1, shard_size=2, cache_dir=str(cache_dir))
+    assert out.read_text(encoding='utf-8') == ''.join(x + '\n' for x in wrong[:3])
+
+    cache_file = cache_dir / (model_hash('model-accentru.onnx', 'vocab-accentru.json') + '.txt')
+    assert len(load_predictions(str(cache_file))) == 3
+
+    # interrupted write, then more words appended to the dictionary
+    with open(cache_file, 'a', encoding='utf-8') as f:
+        f.write('здоро')
+    data.write_text(''.join(x + '\n' for x in right + wrong), encoding='utf-8')
+    compress_stress('model-accentru.onnx', 'vocab-accentru.json', str(data), str(out),
+        workers=1, cache_dir=str(cache_dir))
+    assert out.read_text(encoding='utf-8') == ''.join(x + '\n' for x in wrong)
+    assert load_predictions(str(cache_file)) == {x.replace('\u0301', ''): x for x in right}
+    assert len(cache_file.read_text(encoding='utf-8').splitlines()) == 5  # only new words were evaluated
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'ru_stress.txt', 'ru_stress_compressed.txt']
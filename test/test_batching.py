@@ -0,0 +1,93 @@
+import numpy as np
+import onnx
+
+from accent.predictor import MLPredictor as AccentPredictor
+from accentru.predictor import MLPredictor as StressPredictor
+from translator.batching import buckets, padded_length, padded_lengths, run_buckets
+from translator.predictor import Predictor
+
+
+def test():
+    assert padded_length(1) == 8
+    assert padded_length(4) == 8
+    assert padded_length(5) == 16
+    assert padded_length(30) == 32
+
+
+def test01():
+    groups = buckets([3, 12, 1, 28, 4])
+    assert [(l, rows.tolist()) for l, rows in groups] == [(8, [0, 2, 4]), (16, [1]), (32, [3])]
+    assert padded_lengths(np.array([3, 12, 1, 28, 4], dtype=np.uint8)).tolist() == [8, 16, 8, 32, 8]
+
+
+def make_dynamic(onnx_model, filename):
+    '''
+    Copy of the model with dynamic sequence axis (shipped models have it fixed to 32)
+    '''
+    model = onnx.load(onnx_model)
+    for x in list(model.graph.input) + list(model.graph.output):
+        x.type.tensor_type.shape.dim[1].dim_param = f'{x.name}_seq_len'
+    del model.graph.value_info[:]
+    onnx.save(model, filename)
+    return filename
+
+
+WORDS = ['помилуй', 'аз', 'преподобнейший', 'несть', 'благословенно', 'ей', 'человеколюбивейшему', 'лепота']
+
+
+def test02(tmp_path):
+    data = tmp_path / 'cu-words-civic-dedup.txt'
+    data.write_text('и҆\tи\t10\n', encoding='utf-8')
+    fixed = Predictor('model.onnx', 'vocab.json', str(data))
+    dynamic = Predictor(make_dynamic('model.onnx', str(tmp_path / 'model.onnx')), 'vocab.json', str(data))
+    assert dynamic._ml_predictor._seq_len is None
+
+    # words of several buckets come back in input order, as with full 32 padding
+    result = dynamic.batch(WORDS)
+    assert result == fixed.batch(WORDS)
+    assert result == [dynamic(word) for word in WORDS]
+
+
+def test03(tmp_path):
+    fixed = AccentPredictor('model-accent.onnx', 'vocab-accent.json')
+    dynamic = AccentPredictor(make_dynamic('model-accent.onnx', str(tmp_path / 'model-accent.onnx')), 'vocab-accent.json')
+    assert dynamic._seq_len is None
+
+    result = dynamic.batch(WORDS)
+    assert result == fixed.batch(WORDS)
+    assert result == [dynamic(word) for word in WORDS]
+
+
+def test04(tmp_path):
+    words = ['станок', 'перевязав', 'кровати', 'водонепроницаемость', 'здоровье', 'красота']
+    fixed = StressPredictor('model-accentru.onnx', 'vocab-accentru.json')
+    dynamic = StressPredictor(make_dynamic('model-accentru.onnx', str(tmp_path / 'model-accentru.onnx')), 'vocab-accentru.json')
+    assert dynamic._seq_len is None
+
+    result = dynamic.batch(words)
+    assert result == fixed.batch(words)
+    assert result == [dynamic(word) for word in words]
+
+
+def test05():
+    # model upsampling 2x, every output frame is the input value
+    def run(inputs):
+        x, = inputs
+        return np.repeat(x, 2, axis=1)[:, :, None].astype(np.float32)
+
+    inputs = np.zeros((3, 32), dtype=np.int32)
+    lengths = np.array([3, 12, 2])
+    inputs[0, :3] = 1
+    inputs[1, :12] = 2
+    inputs[2, :2] = 3
+
+    calls = []
+    out = run_buckets(lambda x: calls.append(x[0].shape) or run(x), lengths, [inputs])
+    assert calls == [(2, 8), (1, 16)]
+    assert out.shape == (3, 64, 1)
+    assert np.array_equal(out[:, :, 0], run([inputs])[:, :, 0])
+
+    # padded positions of CTC logits decode to blanks
+    out = run_buckets(lambda x: np.zeros((len(x[0]), 2 * x[0].shape[1], 3)), lengths, [inputs], blank=0)
+    assert (out[0, 16:].argmax(axis=-1) == 0).all()
+
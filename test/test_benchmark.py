@@ -0,0 +1,16 @@
+from translator.benchmark import batched, benchmark, make_batches
+
+
+def test():
+    batches = make_batches(['аз', 'буки', 'веди'], 2, num_words=4)
+    assert batches == [['аз', 'буки'], ['веди', 'аз'], ['буки', 'веди'], ['аз', 'буки']]
+
+    calls = []
+    predict = batched(lambda word: calls.append(word))
+    result = benchmark('upper', predict, batches, batch_size=2, duration=0., min_calls=3)
+    assert calls == ['аз', 'буки'] * 2 + ['веди', 'аз', 'буки', 'веди']
+    assert result['name'] == 'upper'
+    assert result['calls'] == 3
+    assert result['words'] == 6
+    assert result['words_per_sec'] > 0
+    assert 0 <= result['p50_ms'] <= result['p99_ms']
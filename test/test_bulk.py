@@ -0,0 +1,29 @@
+import functools
+import io
+
+from translator.bulk import annotate_shard, bulk, read_shards
+
+
+class Upper:
+    def __init__(self, threads=None):
+        self.threads = threads
+
+    def batch(self, words):
+        return [word.upper() for word in words]
+
+
+def test():
+    predictor = Upper()
+    assert annotate_shard(predictor, 'аз, буки - веди!\n', '[а-я]+') == 'АЗ, БУКИ - ВЕДИ!\n'
+    assert annotate_shard(predictor, '...', '[а-я]+') == '...'
+
+
+def test01():
+    f = io.StringIO(''.join(f'аз {i}\nбуки\n' for i in range(100)))
+    shards = list(read_shards(f, shard_size=7))
+    assert ''.join(shards) == f.getvalue()
+    assert all(shard.count('\n') == 7 for shard in shards[:-1])
+
+    process = functools.partial(annotate_shard, regex='[а-я]+')
+    out = ''.join(bulk(Upper, process, read_shards(io.StringIO(f.getvalue()), shard_size=7), workers=3))
+    assert out == f.getvalue().upper()
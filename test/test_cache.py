@@ -0,0 +1,53 @@
+from translator.cache import CachedPredictor
+
+
+class Upper:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, word):
+        self.calls.append(word)
+        return word.upper() + '!'
+
+
+def test():
+    predictor = Upper()
+    cached = CachedPredictor(predictor, max_size=2)
+
+    assert cached.batch(['аз', 'Аз', 'АЗ', 'буки']) == ['АЗ!', 'АЗ!', 'АЗ!', 'БУКИ!']
+    assert predictor.calls == ['аз', 'буки']
+    assert cached('веди') == 'ВЕДИ!'
+    assert cached('буки') == 'БУКИ!'
+    assert cached('аз') == 'АЗ!'
+    assert predictor.calls == ['аз', 'буки', 'веди', 'аз']
+
+    stats = cached.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 4
+    assert stats['evictions'] == 2
+    assert stats['size'] == 2
+
+
+def test01(tmp_path):
+    filename = str(tmp_path / 'cache')
+    cached = CachedPredictor(Upper(), filename=filename)
+    cached.batch(["ле'пота", 'несть'])
+    cached.close()
+
+    predictor = Upper()
+    cached = CachedPredictor(predictor, filename=filename)
+    assert cached.batch(['ле́пота', 'несть']) == ['ЛЕ́ПОТА!', 'НЕСТЬ!']
+    assert predictor.calls == []
+    assert cached.stats()['disk_hits'] == 2
+    cached.close()
+
+
+def test02():
+    predictor = Upper()
+    cached = CachedPredictor(predictor)
+
+    assert cached('МакДональдс') == 'МАКДОНАЛЬДС!'
+    assert predictor.calls == ['МакДональдс']
+    assert cached.batch(['МакДональдс', 'МакДональдс']) == ['МАКДОНАЛЬДС!', 'МАКДОНАЛЬДС!']
+    assert predictor.calls == ['МакДональдс', 'МакДональдс']
+    assert cached.stats()['size'] == 0
@@ -0,0 +1,29 @@
+import numpy as np
+from pyctcdecode import build_ctcdecoder
+
+from translator.ctc_decoder import CTCDecoder
+
+LABELS = ['', 'а', 'б', 'в', 'г', '́']
+
+
+def test():
+    decoder = CTCDecoder(LABELS)
+
+    logits = np.full((2, 6, len(LABELS)), -20.0, dtype=np.float32)
+    for t,c in enumerate([1, 1, 0, 1, 2, 0]):
+        logits[0, t, c] = 0.
+    for t,c in enumerate([0, 3, 5, 5, 0, 0]):
+        logits[1, t, c] = 0.
+
+    assert decoder(logits) == ['ааб', 'в́']
+    assert decoder.greedy(logits) == ['ааб', 'в́']
+
+
+def test01():
+    rng = np.random.default_rng(42)
+    logits = rng.normal(0, 2, size=(50, 16, len(LABELS))).astype(np.float32)
+
+    reference = build_ctcdecoder(LABELS)
+    expected = [reference.decode(l) for l in logits]
+
+    assert CTCDecoder(LABELS)(logits) == expected
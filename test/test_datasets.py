@@ -0,0 +1,160 @@
+import numpy as np
+import torch
+
+from accent.accent_dataset import AccentDataset
+from multitask.multitask_dataset import MultiTaskDataset
+from translator.dataset_cache import BucketBatchSampler, batch_loader
+from translator.translator_dataset import TranslatorDataset
+
+
+def test(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    fname = tmp_path / 'cu-words-civic-dedup.txt'
+    fname.write_text('лѣ́пота\tле́пота\t5\nи҆\tи\t10\n', encoding='utf-8')
+
+    data = TranslatorDataset(fname=str(fname), max_len=8)
+    data.prepare_data()
+    data.setup()
+    vocab = data.vocab
+
+    # none of these words is in the val partition
+    datum = data.train_data
+    samples = sorted((datum[i] for i in range(len(datum))), key=lambda x: (x['ru_len'].item(), x['ru_acc'].sum().item()))
+    assert len(samples) == 3  # accented sample comes with and without accent hint
+    i, j, k = samples
+    assert i['ru'].tolist() == [vocab['и']] + [0] * 7
+    assert i['cu'].tolist() == [vocab['и'], vocab['҆']] + [0] * 6
+    assert (i['ru_len'].item(), i['cu_len'].item()) == (1, 2)
+    assert j['ru'].tolist() == k['ru'].tolist() == [vocab[c] for c in 'лепота'] + [0] * 2
+    assert k['cu'].tolist() == [vocab[c] for c in 'лѣ́пота'] + [0]
+    assert j['ru_acc'].tolist() == [0] * 8
+    assert k['ru_acc'].tolist() == [0, 1] + [0] * 6
+    assert i['ru'].dtype == i['ru_len'].dtype == i['ru_acc'].dtype == torch.long
+
+    # compact storage
+    assert datum.ru.dtype == datum.ru_len.dtype == np.uint8
+    assert datum.ru_acc.dtype == np.int8 and datum.ru_acc.shape == (3,)
+
+
+def test01(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    fname = tmp_path / 'cu-words-civic-dedup-accent.txt'
+    fname.write_text('лепота\tлепо́та\t5\nа\tа\t10\nсвят\tсвя́т\t1\n', encoding='utf-8')
+
+    data = AccentDataset(fname=str(fname), max_len=8)
+    data.prepare_data()
+    data.setup()
+    vocab = data.vocab
+
+    datum = data.train_data
+    samples = {x['len'].item(): x for x in (datum[i] for i in range(len(datum)))}
+    assert samples[6]['in'].tolist() == [vocab[c] for c in 'лепота'] + [0, 0]
+    assert samples[6]['out'].tolist() == [0, 0, 0, 1, 0, 0, 0, 0]
+    assert samples[4]['out'].tolist() == [0, 0, 1, 0, 0, 0, 0, 0]
+    assert samples[1]['out'].tolist() == [0] * 8
+    assert samples[1]['out'].dtype == torch.long
+
+    # cached arrays are memory-mapped
+    data.setup()
+    assert isinstance(data.train_data.in_, np.memmap)
+    assert data.train_data.out.dtype == np.int8
+
+    # whole batch at once
+    batch = next(iter(data.train_dataloader()))
+    assert batch['in'].shape == batch['out'].shape == (3, 8)
+    assert batch['len'].shape == (3,)
+    assert sorted(batch['out'].sum(axis=1).tolist()) == [0, 1, 1]
+
+
+def test02(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    fname = tmp_path / 'cu-words-civic-dedup-accent.txt'
+    fname.write_text('лепота\tлепо́та\t5\nсвят\tсвя́т\t1\n', encoding='utf-8')
+
+    data = AccentDataset(fname=str(fname), max_len=8)
+    data.prepare_data()
+    cache = data._cache
+    assert 'Adding 2 new samples' in capsys.readouterr().out
+
+    # same source: cache is reused as is
+    data.prepare_data()
+    assert 'Adding' not in capsys.readouterr().out
+
+    # added line: only the new word is encoded and appended
+    with open(fname, 'a', encoding='utf-8') as f:
+        f.write('святе\tсвя́те\t1\n')
+    data.prepare_data()
+    assert 'Adding 1 new samples' in capsys.readouterr().out
+    assert data._cache == cache
+    data.setup()
+    assert len(data.train_data) == 3
+    assert data.train_data[2]['out'].tolist() == [0, 0, 1, 0, 0, 0, 0, 0]
+
+    # edited line: rebuild
+    fname.write_text('лепота\tле́пота\t5\nсвят\tсвя́т\t1\nсвяте\tсвя́те\t1\n', encoding='utf-8')
+    data.prepare_data()
+    assert 'Adding 3 new samples' in capsys.readouterr().out
+    data.setup()
+    assert len(data.train_data) == 3
+    assert sorted(data.train_data[[0, 1, 2]]['out'].argmax(axis=1).tolist()) == [1, 2, 2]
+
+    # different max_len: different cache
+    data = AccentDataset(fname=str(fname), max_len=16)
+    data.prepare_data()
+    assert data._cache != cache
+    assert 'Adding 3 new samples' in capsys.readouterr().out
+
+
+def test03():
+    class Data:
+        def __len__(self):
+            return 10
+
+        def __getitem__(self, i):
+            return {'x': torch.tensor(i)}
+
+    loader = batch_loader(Data(), 4, shuffle=True)
+    batches = [batch['x'].tolist() for batch in loader]
+    assert len(loader) == len(batches) == 3
+    assert sorted(sum(batches, [])) == list(range(10))
+    assert all(batch == sorted(batch) for batch in batches)
+
+    loader = batch_loader(Data(), 4, shuffle=False, prefetch=True)
+    assert len(loader) == 3
+    assert [batch['x'].tolist() for batch in loader] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    # early exit stops the background thread
+    for batch in loader:
+        break
+
+
+def test04():
+    buckets = np.random.default_rng(0).choice([8, 16, 24, 32], size=1000)
+    sampler = BucketBatchSampler(buckets, 10)
+    batches = list(sampler)
+    assert len(sampler) == len(batches) == sum(-(-(buckets == k).sum() // 10) for k in (8, 16, 24, 32))
+    assert sorted(sum(batches, [])) == list(range(1000))
+
+    # every batch takes one bucket, and is full but for the last batch of its bucket
+    assert all(len(set(buckets[batch])) == 1 for batch in batches)
+    assert sum(len(batch) < 10 for batch in batches) <= 4
+    assert batches != list(BucketBatchSampler(buckets, 10))
+
+
+def test05(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    fname = tmp_path / 'cu-words-civic-dedup.txt'
+    fname.write_text('лѣ́пота\tле́пота\t5\nи҆\tи\t10\n', encoding='utf-8')
+    accent_fname = tmp_path / 'cu-words-civic-dedup-accent.txt'
+    accent_fname.write_text('и\tи\t10\n\nаз\nлепота\tлепо́та\t5\n', encoding='utf-8')
+
+    data = MultiTaskDataset(fname=str(fname), accent_fname=str(accent_fname), max_len=8)
+    data.prepare_data()
+    data.setup()
+
+    # blank and one-column lines are skipped, word without accent mark has no accent
+    datum = data.train_data
+    assert sorted(datum.acc.tolist()) == [-1, 1, 1]
+    samples = sorted((datum[i] for i in range(len(datum))), key=lambda x: (x['ru_len'].item(), x['ru_acc'].sum().item()))
+    i, j, k = samples
+    assert i['acc'].tolist() == [0] * 8
+    assert j['acc'].tolist() == k['acc'].tolist() == [0, 1] + [0] * 6
@@ -0,0 +1,29 @@
+import pytest
+
+from translator.encoder import Encoder
+
+VOCAB = {'<pad>': 0, 'а': 1, 'б': 2, 'е': 3, "'": 4, 'э': 5}
+
+
+def test():
+    encoder = Encoder(VOCAB, max_len=4)
+
+    inputs, lengths, accents = encoder(['аб', "Б'Э", 'ааааабб', ''])
+    assert inputs.tolist() == [[1, 2, 0, 0], [2, 4, 5, 0], [1, 1, 1, 1], [0, 0, 0, 0]]
+    assert lengths.tolist() == [2, 3, 4, 0]
+    assert accents.sum() == 0
+
+    with pytest.raises(ValueError):
+        encoder(['абв'])
+
+
+def test01():
+    encoder = Encoder(VOCAB, max_len=4, accents=True, replace={'э': 'е'})
+
+    inputs, lengths, accents = encoder(["Б'Э", 'а́ба́', "'аб", 'ЭЭЭЭ́', 'аэ'])
+    assert inputs.tolist() == [[2, 3, 0, 0], [1, 2, 1, 0], [1, 2, 0, 0], [3, 3, 3, 3], [1, 3, 0, 0]]
+    assert lengths.tolist() == [2, 3, 2, 4, 2]
+    assert accents.tolist() == [[1, 0, 0, 0], [1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1], [0, 0, 0, 0]]
+
+    inputs, lengths, accents = encoder([])
+    assert inputs.shape == (0, 4)
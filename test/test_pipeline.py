@@ -0,0 +1,41 @@
+from accent.decision import make_decision
+from translator.pipeline import Pipeline
+from translator.predictor import MLPredictor
+
+
+def make_pipeline(tmp_path, accent_model='model-accent.onnx'):
+    data = tmp_path / 'cu-words-civic-dedup.txt'
+    data.write_text('лѣ́пота\tле́пота\t5\nи҆\tи\t10\n', encoding='utf-8')
+    accent_data = tmp_path / 'cu-words-civic-dedup-accent.txt'
+    accent_data.write_text('а\tа\t1951\nпомилуй\tпоми́луй\t5\n', encoding='utf-8')
+    return Pipeline('model.onnx', 'vocab.json', str(data), accent_model, 'vocab-accent.json', str(accent_data))
+
+
+def test(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+
+    words = ['лепота', 'помилуй', 'Лепота', 'несть', 'помилуй', 'и']
+    result = pipeline.batch(words)
+    assert len(result) == len(words)
+    assert result[0] == result[2] == 'лѣ́пота'
+    assert result[1] == result[4]
+    assert result[5] == 'и҆'
+    assert result == [pipeline(word) for word in words]
+
+
+def test01(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    predictor = MLPredictor('model.onnx', 'vocab.json')
+
+    # explicit accent and cheat map accent are used as is
+    assert pipeline.translate(["поми'луй", 'преподо́бне']) == predictor.batch(["поми'луй", 'преподо́бне'])
+    assert pipeline.translate(['помилуй']) == predictor.batch(["поми'луй"])
+    assert pipeline.translate([]) == []
+
+
+def test02(tmp_path):
+    # accent model exported with in-graph accent decision gives the same hints
+    decision = make_decision('model-accent.onnx', str(tmp_path / 'model-accent-decision.onnx'), first=True)
+
+    words = ['лепота', 'несть', 'преподобнейший', 'помилуй', 'а']
+    assert make_pipeline(tmp_path, decision).translate(words) == make_pipeline(tmp_path).translate(words)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from translator.server import MicroBatcher, Overloaded, Server
+
+
+class Upper:
+    def __init__(self):
+        self.calls = []
+
+    def batch(self, words):
+        self.calls.append(words)
+        return [word.upper() for word in words]
+
+
+def test():
+    async def main():
+        predictor = Upper()
+        batcher = MicroBatcher(predictor.batch, max_batch=100, max_wait=0.05)
+        task = asyncio.create_task(batcher.run())
+        results = await asyncio.gather(*[batcher.submit(['аз', 'буки', str(i)]) for i in range(10)])
+        task.cancel()
+        return predictor, results, batcher.stats()
+
+    predictor, results, stats = asyncio.run(main())
+    assert results == [['АЗ', 'БУКИ', str(i)] for i in range(10)]
+    assert len(predictor.calls) == 1
+    assert stats['batches'] == 1
+    assert stats['requests'] == 10
+    assert stats['words'] == 30
+
+
+def test01():
+    async def main():
+        batcher = MicroBatcher(Upper().batch, max_queue=2)
+        pending = [asyncio.create_task(batcher.submit(['аз'])) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await batcher.submit(['аз'])
+        for task in pending:
+            task.cancel()
+        return batcher.stats()
+
+    assert asyncio.run(main())['rejected'] == 1
+
+
+def test02():
+    async def request(port, body):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        body = json.dumps(body).encode()
+        writer.write(b'POST /translate HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+
+    async def main():
+        predictor = Upper()
+        server = Server({'translate': (predictor, '[а-я]+')}, max_wait=0.05)
+        port = (await server.start(port=0)).sockets[0].getsockname()[1]
+        results = await asyncio.gather(
+            request(port, {'words': ['аз', 'буки']}),
+            request(port, {'words': ['веди']}),
+            request(port, {'words': ['z']}),
+            request(port, {'text': 'аз'}),
+        )
+        await server.close()
+        return predictor, results
+
+    predictor, results = asyncio.run(main())
+    assert results[0] == (200, {'words': ['АЗ', 'БУКИ']})
+    assert results[1] == (200, {'words': ['ВЕДИ']})
+    assert results[2][0] == 400
+    assert results[3][0] == 400
+    assert predictor.calls == [['аз', 'буки', 'веди']]
+
+
+def test03():
+    async def main():
+        predictor = Upper()
+        batcher = MicroBatcher(predictor.batch, max_batch=10, max_wait=0.05)
+        task = asyncio.create_task(batcher.run())
+        large = [f'аз{i}' for i in range(25)]
+        requests = [['буки', str(i), 'веди'] for i in range(5)]
+        results = await asyncio.gather(batcher.submit(large), *[batcher.submit(words) for words in requests])
+        task.cancel()
+        return predictor, large, requests, results
+
+    predictor, large, requests, results = asyncio.run(main())
+    assert results == [[word.upper() for word in words] for words in [large] + requests]
+    assert max(len(call) for call in predictor.calls) <= 10
+    assert sum(len(call) for call in predictor.calls) == 25 + 15
@@ -0,0 +1,36 @@
+import os
+import shutil
+
+import numpy as np
+import onnxruntime as ort
+
+from translator.session import create_session, optimized_filename, synthetic_inputs
+
+
+def test(tmp_path):
+    filename = str(tmp_path / 'model-accentru.onnx')
+    shutil.copy('model-accentru.onnx', filename)
+    assert optimized_filename(filename) == str(tmp_path / 'model-accentru.optimized.onnx')
+
+    session = create_session(filename)
+    assert os.path.isfile(optimized_filename(filename))
+    assert sorted(os.listdir(tmp_path)) == ['model-accentru.onnx', 'model-accentru.optimized.onnx']
+
+    inputs = synthetic_inputs(session, batch_size=3)
+    assert inputs['inputs'].shape == (3, 32)
+    inputs['inputs'][:, :5] = [3, 4, 5, 6, 7]
+    expected = session.run(None, inputs)[0]
+
+    # second load uses the optimized graph
+    mtime = os.path.getmtime(optimized_filename(filename))
+    session = create_session(filename, threads=1)
+    assert os.path.getmtime(optimized_filename(filename)) == mtime
+    # cached graph still gets the layout optimizations of a plain session
+    assert session.get_session_options().graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    assert np.allclose(session.run(None, inputs)[0], expected, atol=1.e-5)
+
+    # model is newer than the optimized graph
+    os.utime(filename, (mtime + 10, mtime + 10))
+    session = create_session(filename)
+    assert os.path.getmtime(optimized_filename(filename)) > mtime
+    assert np.allclose(session.run(None, inputs)[0], expected, atol=1.e-5)
@@ -0,0 +1,44 @@
+import io
+
+from translator.translate import map_punctuation, read_chunks, split_text, translate_text
+
+TEXT = 'Во имя Отца, и Сына... 12 раз // АМИНЬ?\n\nИ   ещё  раз'
+
+
+class Yer:
+    def __init__(self):
+        self.batches = []
+
+    def batch(self, words):
+        self.batches.append(words)
+        return [word.lower() + 'ъ' for word in words]
+
+
+def test():
+    pieces = list(split_text(read_chunks(io.StringIO(TEXT), chunk_size=3), chunk_size=3))
+    assert ''.join(pieces) == TEXT
+    assert pieces[:4] == ['Во', ' ', 'имя', ' ']
+    assert 'АМИНЬ' in pieces
+
+
+def test01():
+    predictor = Yer()
+    pieces = split_text(read_chunks(io.StringIO(TEXT), chunk_size=5), chunk_size=5)
+    out = ''.join(translate_text(predictor, pieces, window=6))
+
+    assert out == 'Воъ имяъ Отцаъ, иъ Сынаъ... в҃і разъ * АМИНЬЪ;\n\nИЪ ещъё разъ'
+    assert all(len(batch) <= 6 for batch in predictor.batches)
+
+
+def test02():
+    assert map_punctuation(' 1/2; ') == ' а҃ *в҃. '
+    assert map_punctuation(' 1/2; ', numerals=False) == ' 1 *2. '
+
+
+def test03():
+    # no spaces to cut at: held back text is still bounded
+    text = 'аз ' + '1' * 100 + ' ' + 'б' * 50 + '.' * 100
+    pieces = list(split_text(read_chunks(io.StringIO(text), chunk_size=10), chunk_size=10, max_word=20))
+    assert ''.join(pieces) == text
+    assert max(len(piece) for piece in pieces) <= 20 + 10
+    assert pieces[:2] == ['аз', ' ']
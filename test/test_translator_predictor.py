@@ -0,0 +1,27 @@
+from translator.predictor import Predictor
+
+
+def make_predictor(tmp_path):
+    data = tmp_path / 'cu-words-civic-dedup.txt'
+    data.write_text('лѣ́пота\tле́пота\t5\nи҆\tи\t10\n', encoding='utf-8')
+    return Predictor('model.onnx', 'vocab.json', str(data))
+
+
+def test(tmp_path):
+    predictor = make_predictor(tmp_path)
+
+    assert predictor('ле́пота') == 'лѣ́пота'
+    assert predictor('лепота') == 'лѣ́пота'
+    assert predictor("Ле'пота") == 'лѣ́пота'
+    assert predictor('и') == 'и҆'
+
+
+def test01(tmp_path):
+    predictor = make_predictor(tmp_path)
+
+    words = ['помилуй', 'лепота', 'помилуй', 'несть']
+    result = predictor.batch(words)
+    assert len(result) == len(words)
+    assert result[0] == result[2]
+    assert result[1] == 'лѣ́пота'
+    assert result == [predictor(word) for word in words]
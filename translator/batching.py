@@ -0,0 +1,64 @@
+import numpy as np
+
+MAX_LEN = 32
+BUCKET = 8
+# the backward GRU runs over the trailing pad positions first, so its output depends on
+# the padding. Models trained on 32-padded words lose accuracy with no spare padding
+# (accent error rate 0.6% -> 5%), with at least 4 pad positions error rates match full
+# padding. Training batches only take words of one padded length and are trimmed to it
+# (see translator.dataset_cache), so every word sees the padding it gets at inference.
+# `python -m <package>.onnx_export --padding` measures bucketed vs full padding error
+# rates of a model on the validation split.
+MIN_PADDING = 4
+
+
+def sequence_length(session, name='inputs'):
+    '''
+    Fixed sequence length of the model input, or None if the sequence axis is dynamic
+    '''
+    shape = next(x.shape for x in session.get_inputs() if x.name == name)
+    return shape[1] if isinstance(shape[1], int) else None
+
+def padded_length(length, max_len=MAX_LEN, bucket=BUCKET, min_padding=MIN_PADDING):
+    return min(max_len, -(-(length + min_padding) // bucket) * bucket)
+
+def padded_lengths(lengths, max_len=MAX_LEN, bucket=BUCKET, min_padding=MIN_PADDING):
+    '''
+    Vectorized padded_length()
+    '''
+    return np.minimum(max_len, -(-(np.asarray(lengths, dtype=np.int64) + min_padding) // bucket) * bucket)
+
+def buckets(lengths, max_len=MAX_LEN, bucket=BUCKET, min_padding=MIN_PADDING):
+    '''
+    Groups batch rows by padded length. Returns list of (padded_length, row indices)
+    '''
+    padded = padded_lengths(lengths, max_len, bucket, min_padding)
+    return [(int(l), np.flatnonzero(padded == l)) for l in np.unique(padded)]
+
+def groups(lengths, seq_len=None):
+    '''
+    Groups of batch rows to run through the model: all rows at once if the model has fixed
+    sequence length seq_len, or length buckets if its sequence axis is dynamic (seq_len is None)
+    '''
+    if seq_len is None:
+        return buckets(lengths)
+    return [(seq_len, np.arange(len(lengths)))]
+
+def run_buckets(run, lengths, inputs, *, blank=None):
+    '''
+    Runs `run(inputs)` on every length bucket of the batch, with [B, S] inputs trimmed the
+    way predictors pad words, and returns the outputs of the whole batch padded back to S
+    positions ([B, S, ...], or [B, 2S, ...] for the translator). Padded positions of CTC
+    logits (blank is the index of the blank class) decode to blanks.
+    '''
+    out = None
+    for seq_len, rows in buckets(lengths, max_len=inputs[0].shape[1]):
+        logits = run([x[rows, :seq_len] for x in inputs])
+        if out is None:
+            scale = logits.shape[1] // seq_len
+            out = np.zeros((len(lengths), inputs[0].shape[1] * scale) + logits.shape[2:], dtype=logits.dtype)
+            if blank is not None:
+                out[:] = -1.e9
+                out[..., blank] = 0.
+        out[rows, :logits.shape[1]] = logits
+    return out
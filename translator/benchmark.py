@@ -0,0 +1,212 @@
+'''
+Inference benchmarks: throughput (words per second) and latency percentiles of
+the predictors at different batch sizes.
+
+    python -m translator.benchmark -o bench-before.json
+    python -m translator.benchmark -o bench-after.json
+    python -m translator.benchmark --compare bench-before.json bench-after.json
+
+Every benchmark feeds batches of words for at least `--duration` seconds. Latency
+is measured per call (i.e. per batch, or per paragraph for stress_text). session.*
+benchmarks run the translator model alone, with the cached optimized graph or with a
+plain ORT_ENABLE_ALL session (see translator.session).
+'''
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+BATCH_SIZES = (1, 4, 16, 64, 256, 1024)
+DURATION = 1.0  # seconds per benchmark
+MIN_CALLS = 3
+
+# realistic paragraph of russian text (Pushkin, "Capitan's Daughter")
+PARAGRAPH = (
+    'Отец мой Андрей Петрович Гринёв в молодости своей служил при графе Минихе и вышел в '
+    'отставку премьер-майором в 17.. году. С тех пор жил он в своей Симбирской деревне, где и '
+    'женился на девице Авдотье Васильевне Ю., дочери бедного тамошнего дворянина. Нас было девять '
+    'человек детей. Все мои братья и сёстры умерли во младенчестве. Матушка была еще мною брюхата, '
+    'как уже я был записан в Семеновский полк сержантом, по милости майора гвардии князя Б., '
+    'близкого нашего родственника.'
+)
+
+
+def percentile(latencies, q):
+    return float(np.percentile(latencies, q)) * 1000
+
+def benchmark(name, predict, batches, *, batch_size, duration=DURATION, min_calls=MIN_CALLS):
+    '''
+    Calls predict(batch) for batches (cycling) for at least `duration` seconds.
+    Returns dictionary with throughput and latency stats.
+    '''
+    predict(batches[0])  # warm-up
+
+    latencies = []
+    words = 0
+    start = time.perf_counter()
+    while len(latencies) < min_calls or time.perf_counter() - start < duration:
+        batch = batches[len(latencies) % len(batches)]
+        t = time.perf_counter()
+        predict(batch)
+        latencies.append(time.perf_counter() - t)
+        words += len(batch)
+
+    return {
+        'name': name,
+        'batch_size': batch_size,
+        'calls': len(latencies),
+        'words': words,
+        'words_per_sec': words / sum(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+    }
+
+def batched(predictor):
+    if hasattr(predictor, 'batch'):
+        return predictor.batch
+    return lambda words: [predictor(word) for word in words]
+
+def make_batches(words, batch_size, num_words=4096):
+    # at least a few distinct batches, so that we do not measure one batch over and over
+    num_batches = max(4, num_words // batch_size)
+    return [
+        [words[(i * batch_size + j) % len(words)] for j in range(batch_size)]
+        for i in range(num_batches)
+    ]
+
+def load_words(data, regex, seed=42):
+    with open(data, encoding='utf-8') as f:
+        words = [l.strip().split('\t')[0].replace('\u0301', '') for l in f if l.strip()]
+    words = [word for word in words if re.fullmatch(regex, word)]
+    random.Random(seed).shuffle(words)
+    return words
+
+class SessionPredictor:
+    '''
+    Runs the translator model session only (no decoding), to compare session options
+    '''
+    def __init__(self, onnx_model, vocab, *, cache):
+        from translator.encoder import Encoder
+        from translator.session import create_session
+
+        self._session = create_session(onnx_model, cache=cache)
+        with open(vocab) as f:
+            self._encoder = Encoder(json.load(f), accents=True, replace={'э': 'е'})
+
+    def batch(self, words):
+        inputs, _, accents = self._encoder(words)
+        return self._session.run(None, {'inputs': inputs, 'accents': accents})[0]
+
+def run(args, report):
+    from accentru.predictor import MLPredictor as StressMLPredictor
+    from accentru.predictor import Predictor as StressPredictor
+    from accentru.predictor import VocabPredictor as StressVocabPredictor
+    from accentru.predictor import stress_text
+    from translator.predictor import MLPredictor, Predictor
+
+    words = load_words(args.stress_data, '[а-я]+')
+    paragraph_words = re.findall(StressPredictor.RE, PARAGRAPH, flags=re.IGNORECASE)
+
+    translator_words = [word.replace('ё', 'е') for word in words]
+    benchmarks = [
+        ('accentru.VocabPredictor', lambda: StressVocabPredictor(args.stress_data), words),
+        ('accentru.MLPredictor', lambda: StressMLPredictor(args.stress_model, args.stress_vocab), words),
+        ('accentru.Predictor', lambda: StressPredictor(args.stress_model, args.stress_vocab, args.stress_data), paragraph_words),
+        ('translator.MLPredictor', lambda: MLPredictor(args.model, args.vocab), translator_words),
+        ('session.plain', lambda: SessionPredictor(args.model, args.vocab, cache=False), translator_words),
+        ('session.cached', lambda: SessionPredictor(args.model, args.vocab, cache=True), translator_words),
+    ]
+    if os.path.isfile(args.data):
+        benchmarks.append(('translator.Predictor', lambda: Predictor(args.model, args.vocab, args.data), translator_words))
+    else:
+        print(f'{args.data} not found, skipping translator.Predictor', file=sys.stderr)
+
+    for name, make_predictor, source in benchmarks:
+        if args.only and not any(x in name for x in args.only):
+            continue
+        predict = batched(make_predictor())
+        for batch_size in args.batch_sizes:
+            report(benchmark(name, predict, make_batches(source, batch_size),
+                batch_size=batch_size,
+                duration=args.duration,
+            ))
+
+    name = 'accentru.stress_text'
+    if not args.only or any(x in name for x in args.only):
+        predictor = StressPredictor(args.stress_model, args.stress_vocab, args.stress_data)
+        report(benchmark(name, lambda words: ''.join(stress_text(predictor, PARAGRAPH)), [paragraph_words],
+            batch_size=len(paragraph_words),
+            duration=args.duration,
+        ))
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'onnxruntime': ort.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare(before, after):
+    '''
+    Prints throughput and p99 latency ratios (after / before) for benchmarks present in both runs
+    '''
+    with open(before) as f:
+        before = {(r['name'], r['batch_size']): r for r in json.load(f)['results']}
+    with open(after) as f:
+        after = json.load(f)['results']
+
+    print(f'{"benchmark":<28} {"batch":>6} {"words/sec":>12} {"ratio":>7} {"p99 ms":>10} {"ratio":>7}')
+    for r in after:
+        b = before.get((r['name'], r['batch_size']))
+        if b is None:
+            continue
+        print(f'{r["name"]:<28} {r["batch_size"]:>6} {r["words_per_sec"]:>12.1f} '
+            f'{r["words_per_sec"] / b["words_per_sec"]:>7.2f} {r["p99_ms"]:>10.2f} {r["p99_ms"] / b["p99_ms"]:>7.2f}')
+
+
+if __name__ == '__main__':
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(description='Benchmarks predictors')
+    parser.add_argument('-o', '--output', help='File name of the JSON output (default is no JSON output)')
+    parser.add_argument('-b', '--batch-sizes', type=int, nargs='+', default=BATCH_SIZES, help=f'Batch sizes to measure (default is {" ".join(str(x) for x in BATCH_SIZES)})')
+    parser.add_argument('--duration', type=float, default=DURATION, help=f'Min duration of every benchmark in seconds (default is {DURATION})')
+    parser.add_argument('--only', nargs='+', help='Run only benchmarks with names containing any of these strings')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two JSON outputs instead of running benchmarks')
+    parser.add_argument('-m', '--model', default='model.onnx', help='File name of the translator ONNX file')
+    parser.add_argument('-v', '--vocab', default='vocab.json', help='File name of the translator vocab JSON file')
+    parser.add_argument('-d', '--data',  default='data/cu-words-civic-dedup.txt', help='File name of the civic to CU dictionary file')
+    parser.add_argument('--stress-model', default='model-accentru.onnx', help='File name of the russian accent ONNX file')
+    parser.add_argument('--stress-vocab', default='vocab-accentru.json', help='File name of the russian accent vocab JSON file')
+    parser.add_argument('--stress-data', default='data/ru_stress_compressed.txt', help='File name of the russian stress dictionary file')
+
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        parser.exit()
+
+    results = []
+    def report(result):
+        results.append(result)
+        print(f'{result["name"]:<28} batch={result["batch_size"]:<5} {result["words_per_sec"]:>10.1f} words/sec  '
+            f'p50={result["p50_ms"]:.2f}ms  p99={result["p99_ms"]:.2f}ms', file=sys.stderr)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        run(args, report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
@@ -0,0 +1,118 @@
+'''
+Bulk processing of large text files on all cores.
+
+    python -m translator.bulk translate corpus.txt -o corpus-cu.txt
+    python -m translator.bulk stress corpus-ru.txt -o corpus-ru-stressed.txt -j 8
+
+Input is split into shards of whole lines, shards are processed by a pool of worker
+processes and results are written in the input order. Every worker loads its own
+predictor (and inference session) once, with intra-op threads limited so that the
+workers together do not use more threads than there are cores.
+'''
+import collections
+import contextlib
+import functools
+import itertools
+import multiprocessing
+import os
+import re
+import sys
+
+from translator.cache import CachedPredictor
+from translator.translate import split_text, translate_window
+
+SHARD_SIZE = 10_000  # lines
+
+
+def bulk(make_predictor, process, shards, *, workers=None):
+    '''
+    Runs `process(predictor, shard)` for every shard in a pool of worker processes.
+    Yields results in the input order.
+
+    make_predictor: called once in every worker, takes `threads` keyword argument.
+        Both make_predictor and process must be picklable (e.g. module-level functions
+        or functools.partial of those).
+    '''
+    workers = workers or os.cpu_count()
+    threads = max(1, os.cpu_count() // workers)
+
+    with multiprocessing.Pool(workers, _init, (make_predictor, process, threads)) as pool:
+        # keep a couple of shards per worker in flight, so that memory use is bounded
+        pending = collections.deque()
+        for shard in shards:
+            pending.append(pool.apply_async(_run, (shard,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+_worker = None
+
+def _init(make_predictor, process, threads):
+    global _worker
+    with contextlib.redirect_stdout(sys.stderr):
+        predictor = CachedPredictor(make_predictor(threads=threads))
+    _worker = (predictor, process)
+
+def _run(shard):
+    predictor, process = _worker
+    return process(predictor, shard)
+
+def read_shards(f, shard_size=SHARD_SIZE):
+    while True:
+        lines = list(itertools.islice(f, shard_size))
+        if not lines:
+            break
+        yield ''.join(lines)
+
+def translate_shard(predictor, text):
+    return ''.join(translate_window(predictor, list(split_text([text]))))
+
+def annotate_shard(predictor, text, regex):
+    '''
+    Replaces every word (match of regex) in text with its prediction, all words in one batch
+    '''
+    pieces = re.split(f'({regex})', text, flags=re.IGNORECASE)
+    pieces[1::2] = predictor.batch(pieces[1::2])
+    return ''.join(pieces)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from accent.predictor import Predictor as AccentPredictor
+    from accentru.predictor import Predictor as StressPredictor
+    from translator.predictor import Predictor
+
+    DEFAULTS = {
+        'translate': ('model.onnx', 'vocab.json', 'data/cu-words-civic-dedup.txt'),
+        'accent': ('model-accent.onnx', 'vocab-accent.json', 'data/cu-words-civic-dedup-accent.txt'),
+        'stress': ('model-accentru.onnx', 'vocab-accentru.json', 'data/ru_stress_compressed.txt'),
+    }
+
+    parser = argparse.ArgumentParser(description='Processes large text files in parallel')
+    parser.add_argument('task', choices=list(DEFAULTS), help='Translate civic text to CU, put accents on civic text or stress marks on russian text')
+    parser.add_argument('input', help='Input text file')
+    parser.add_argument('-o', '--output', required=True, help='Output text file')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes (default is number of cores)')
+    parser.add_argument('-s', '--shard-size', type=int, default=SHARD_SIZE, help=f'Number of lines in one shard (default is {SHARD_SIZE})')
+    parser.add_argument('-m', '--model', help='File name of the model ONNX file')
+    parser.add_argument('-v', '--vocab', help='File name of the vocab JSON file')
+    parser.add_argument('-d', '--data', help='File name of the dictionary file')
+
+    args = parser.parse_args()
+
+    model, vocab, data = (x if y is None else y for x, y in zip(DEFAULTS[args.task], (args.model, args.vocab, args.data)))
+    if args.task == 'translate':
+        make_predictor = functools.partial(Predictor, model, vocab, data)
+        process = translate_shard
+    elif args.task == 'accent':
+        make_predictor = functools.partial(AccentPredictor, model, vocab, data)
+        process = functools.partial(annotate_shard, regex=AccentPredictor.RE)
+    else:
+        make_predictor = functools.partial(StressPredictor, model, vocab, data)
+        process = functools.partial(annotate_shard, regex=StressPredictor.RE)
+
+    with open(args.input, encoding='utf-8') as f, open(args.output, 'w', encoding='utf-8') as out:
+        for text in bulk(make_predictor, process, read_shards(f, args.shard_size), workers=args.workers):
+            out.write(text)
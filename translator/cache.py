@@ -0,0 +1,127 @@
+import collections
+import dbm
+
+
+class CachedPredictor:
+    '''
+    Wraps a predictor (anything with `__call__(word)` and, optionally, `batch(words)`)
+    with a bounded in-memory LRU cache, backed by an optional on-disk store that
+    survives restarts.
+
+    Keys are lower-cased words with the accent hint normalized to \\u0301. Cached
+    predictions are restored to the case of the input word. Mixed-case words
+    (neither lower, upper nor title case) bypass the cache.
+
+    Stats count unique keys per batch: a word repeated in one batch is one lookup.
+    '''
+
+    def __init__(self, predictor, *, max_size=100_000, filename=None):
+        self._predictor = predictor
+        self._max_size = max_size
+        self._lru = collections.OrderedDict()
+        self._store = dbm.open(filename, 'c') if filename is not None else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        keys = [cache_key(word) if is_cacheable(word) else None for word in words]
+
+        values = {}
+        misses = []
+        for key in dict.fromkeys(k for k in keys if k is not None):
+            value = self._get(key)
+            if value is None:
+                misses.append(key)
+            else:
+                values[key] = value
+
+        for key, value in zip(misses, self._predict(misses)):
+            self._put(key, value)
+            values[key] = value
+
+        uncached = list(dict.fromkeys(word for word, key in zip(words, keys) if key is None))
+        uncached = dict(zip(uncached, self._predict(uncached)))
+
+        return [
+            uncached[word] if key is None else restore_caps(word, values[key])
+            for word, key in zip(words, keys)
+        ]
+
+    def _predict(self, words):
+        if not words:
+            return []
+        if hasattr(self._predictor, 'batch'):
+            return self._predictor.batch(words)
+        return [self._predictor(word) for word in words]
+
+    def _get(self, key):
+        value = self._lru.get(key)
+        if value is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return value
+
+        if self._store is not None:
+            value = self._store.get(key)
+            if value is not None:
+                value = value.decode('utf-8')
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def _put(self, key, value):
+        self._remember(key, value)
+        if self._store is not None:
+            self._store[key] = value.encode('utf-8')
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        if len(self._lru) > self._max_size:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'size': len(self._lru),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.,
+        }
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+def cache_key(word):
+    return word.lower().replace("'", '\u0301')
+
+def is_cacheable(word):
+    return word == word.lower() or word == word.upper() or word == word.capitalize()
+
+def restore_caps(text, translation):
+    '''
+    Restores case of the translation from the input text (see maybeRestoreCaps in ui/src/App.svelte)
+    '''
+    if text.lower() == text:
+        return translation
+    elif text.upper() == text:
+        return translation.upper()
+    elif text[0].upper() == text[0] and text[1:].lower() == text[1:]:
+        # title case
+        return translation[:1].upper() + translation[1:]
+    else:
+        return translation
@@ -0,0 +1,40 @@
+import torch
+import torch.nn.functional as F
+
+DILATIONS = (1, 2, 4, 8, 16)  # receptive field of 63 positions with kernel 3
+
+
+class ConvEncoder(torch.nn.Module):
+    '''
+    Stack of residual dilated 1-D convolutions. Drop-in replacement of the bidirectional
+    `torch.nn.GRU(input_dim, hidden_dim, bidirectional=True, batch_first=True)`:
+    takes [B, S, input_dim] and returns ([B, S, 2 * hidden_dim], None).
+
+    Unlike GRU, all positions are computed in parallel.
+    '''
+
+    def __init__(self, input_dim, hidden_dim, *, dilations=DILATIONS, kernel_size=3, dropout=0.1):
+        super().__init__()
+        channels = hidden_dim * 2
+        self.proj = torch.nn.Conv1d(input_dim, channels, 1)
+        self.convs = torch.nn.ModuleList(
+            torch.nn.Conv1d(channels, channels, kernel_size, dilation=d, padding=d * (kernel_size - 1) // 2)
+            for d in dilations
+        )
+        self.dropout = torch.nn.Dropout(dropout)
+
+    def forward(self, x):
+        x = self.proj(x.transpose(1, 2))  # [B, C, S]
+        for conv in self.convs:
+            x = x + self.dropout(F.relu(conv(x)))
+        return x.transpose(1, 2), None
+
+def make_encoder(encoder, input_dim, hidden_dim, *, dropout):
+    '''
+    Creates encoder of the given architecture: "gru" (3-layer bidirectional GRU) or "conv"
+    '''
+    if encoder == 'gru':
+        return torch.nn.GRU(input_dim, hidden_dim, bidirectional=True, batch_first=True, num_layers=3, dropout=dropout)
+    elif encoder == 'conv':
+        return ConvEncoder(input_dim, hidden_dim, dropout=dropout)
+    raise ValueError(f'unknown encoder: {encoder}')
@@ -0,0 +1,167 @@
+import numpy as np
+
+# same defaults as pyctcdecode
+BEAM_WIDTH = 100
+BEAM_PRUNE_LOGP = -10.0
+TOKEN_MIN_LOGP = -5.0
+MIN_TOKEN_CLIP_P = 1e-15
+
+HASH_MULT = np.uint64(0x9E3779B97F4A7C15)  # rolling hash of the decoded prefix
+
+
+class CTCDecoder:
+    '''
+    Batched CTC decoder. Takes logits of shape [B, T, V] and returns top beam text
+    for every row, same as pyctcdecode's `decoder.decode` (without LM) would.
+
+    Rows where every frame has a single candidate token are decoded greedily (beam
+    search can not diverge there), the rest go through prefix beam search which is
+    vectorized over the batch dimension.
+    '''
+
+    def __init__(self, labels, *, blank=0,
+            beam_width=BEAM_WIDTH,
+            beam_prune_logp=BEAM_PRUNE_LOGP,
+            token_min_logp=TOKEN_MIN_LOGP,
+    ):
+        self.labels = np.array(['' if i == blank else x for i,x in enumerate(labels)], dtype=object)
+        self.blank = blank
+        self.beam_width = beam_width
+        self.beam_prune_logp = beam_prune_logp
+        self.token_min_logp = token_min_logp
+
+    def __call__(self, logits):
+        return self.decode(logits)
+
+    def decode(self, logits):
+        logits = log_softmax(np.asarray(logits))
+        if logits.ndim != 3 or logits.shape[-1] != len(self.labels):
+            raise ValueError(f'Expected logits of shape [B, T, {len(self.labels)}], got {logits.shape}')
+
+        candidates = logits >= self.token_min_logp
+        np.put_along_axis(candidates, logits.argmax(axis=-1)[..., None], True, axis=-1)
+        single = (candidates.sum(axis=-1) == 1).all(axis=-1)
+
+        sequences = [None] * logits.shape[0]
+        for i,seq in zip(np.flatnonzero(single), greedy_search(logits[single], self.blank)):
+            sequences[i] = seq
+        beam = ~single
+        if beam.any():
+            for i,seq in zip(np.flatnonzero(beam), self._beam_search(logits[beam], candidates[beam])):
+                sequences[i] = seq
+
+        return [''.join(self.labels[seq]) for seq in sequences]
+
+    def _beam_search(self, logits, candidates):
+        B, T, _ = logits.shape
+        rows = np.arange(B)
+
+        # beams, one row per batch element: prefix hash, last token (blank is -1 at start), score
+        prefix = np.zeros((B, 1), dtype=np.uint64)
+        last = np.full((B, 1), -1, dtype=np.int64)
+        score = np.zeros((B, 1), dtype=np.float64)
+        valid = np.ones((B, 1), dtype=bool)
+
+        # back pointers to reconstruct the prefix of the winning beam
+        parents = []
+        tokens = []
+
+        for t in range(T):
+            # expand every live beam with every candidate token of its frame
+            cb, cc = np.nonzero(candidates[:, t])
+            width = score.shape[1]
+            xb = np.repeat(cb, width)
+            xc = np.repeat(cc, width)
+            xk = np.tile(np.arange(width), len(cb))
+            live = valid[xb, xk]
+            xb, xc, xk = xb[live], xc[live], xk[live]
+
+            extend = (xc != self.blank) & (xc != last[xb, xk])
+            xh = prefix[xb, xk]
+            xh = np.where(extend, xh * HASH_MULT + (xc + 1).astype(np.uint64), xh)
+            xs = score[xb, xk] + logits[xb, t, xc].astype(np.float64)
+
+            # merge beams with the same prefix and the same last token
+            order = np.lexsort((xc, xh, xb))
+            xb, xc, xk, xh, xs, extend = xb[order], xc[order], xk[order], xh[order], xs[order], extend[order]
+            start = np.flatnonzero(np.r_[True, (xb[1:] != xb[:-1]) | (xh[1:] != xh[:-1]) | (xc[1:] != xc[:-1])])
+            gs = np.logaddexp.reduceat(xs, start)
+            gb, gc, gk, gh, gx = xb[start], xc[start], xk[start], xh[start], extend[start]
+
+            # drop outliers and keep the best beams of every batch element
+            order = np.lexsort((-gs, gb))
+            gs, gb, gc, gk, gh, gx = gs[order], gb[order], gc[order], gk[order], gh[order], gx[order]
+            rank = _rank_within(gb)
+            best = gs[np.flatnonzero(rank == 0)][gb]
+            keep = (rank < self.beam_width) & (gs >= best + self.beam_prune_logp)
+            gs, gb, gc, gk, gh, gx, rank = gs[keep], gb[keep], gc[keep], gk[keep], gh[keep], gx[keep], rank[keep]
+
+            width = rank.max() + 1
+            prefix = np.zeros((B, width), dtype=np.uint64)
+            last = np.full((B, width), self.blank, dtype=np.int64)
+            score = np.full((B, width), -np.inf, dtype=np.float64)
+            valid = np.zeros((B, width), dtype=bool)
+            parent = np.zeros((B, width), dtype=np.int64)
+            token = np.full((B, width), -1, dtype=np.int64)
+
+            prefix[gb, rank] = gh
+            last[gb, rank] = gc
+            score[gb, rank] = gs
+            valid[gb, rank] = True
+            parent[gb, rank] = gk
+            token[gb, rank] = np.where(gx, gc, -1)
+            parents.append(parent)
+            tokens.append(token)
+
+        # final merge ignores the last token, beams ending with and without blank are the same text
+        xb, xk = np.nonzero(valid)
+        xh, xs = prefix[xb, xk], score[xb, xk]
+        order = np.lexsort((xh, xb))
+        xb, xk, xh, xs = xb[order], xk[order], xh[order], xs[order]
+        start = np.flatnonzero(np.r_[True, (xb[1:] != xb[:-1]) | (xh[1:] != xh[:-1])])
+        gs = np.logaddexp.reduceat(xs, start)
+        gb, gk = xb[start], xk[start]
+        order = np.lexsort((-gs, gb))
+        gb, gk = gb[order], gk[order]
+        k = gk[_rank_within(gb) == 0]
+
+        out = np.full((B, T), -1, dtype=np.int64)
+        for t in range(T - 1, -1, -1):
+            out[:, t] = tokens[t][rows, k]
+            k = parents[t][rows, k]
+
+        return [seq[seq >= 0] for seq in out]
+
+    def greedy(self, logits):
+        return [''.join(self.labels[seq]) for seq in greedy_search(np.asarray(logits), self.blank)]
+
+
+def log_softmax(logits):
+    '''
+    Converts logits to clipped log probabilities, in the same way as pyctcdecode does.
+    '''
+    x_max = logits.max(axis=-1, keepdims=True)
+    x_max[~np.isfinite(x_max)] = 0
+    x = logits - x_max
+    with np.errstate(divide='ignore'):
+        x = x - np.log(np.exp(x).sum(axis=-1, keepdims=True))
+    return np.clip(x, np.log(MIN_TOKEN_CLIP_P), 0)
+
+
+def greedy_search(logits, blank=0):
+    '''
+    Best path decoding: argmax of every frame, repeats collapsed, blanks removed.
+    '''
+    best = logits.argmax(axis=-1)  # [B, T]
+    keep = best != blank
+    keep[:, 1:] &= best[:, 1:] != best[:, :-1]
+    return [seq[mask] for seq,mask in zip(best, keep)]
+
+
+def _rank_within(groups):
+    '''
+    Position of each element within its run of equal values (groups must be sorted)
+    '''
+    start = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[start, len(groups)])
+    return np.arange(len(groups)) - np.repeat(start, counts)
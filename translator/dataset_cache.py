@@ -0,0 +1,261 @@
+'''
+Compact on-disk format of the dataset tensors.
+
+Every array is a separate .npy file in a partition directory (e.g. `train/cu.npy`), stored
+with the narrowest dtype: uint8 character indices and lengths, int8 accent positions
+(-1 is no accent). Arrays are memory-mapped on load, so setup() is instant and pages are
+shared by DataLoader worker processes. They are expanded to int64 (and one-hot) training
+tensors per batch only: batch_loader() draws a (shuffled) batch of indices, datasets take
+the list of indices and slice every array with one fancy-index, and the batch is passed
+through without per-sample collation. With bucket keys given (padded lengths of the
+samples, see translator.batching), every batch takes samples of one bucket only, so
+that the models can trim it to the padded length shared by all its samples: every word
+is padded the way inference pads it.
+Optionally, the next batches are prepared on a background thread while the model trains
+on the current one.
+
+Cache directory is keyed by the hash of the source file name, max_len and vocabulary.
+The hash of the source file content is kept in the cache state: when the source changes
+by added lines only, just the new lines are encoded and appended to the cached arrays.
+Any other change (edited or removed lines) rebuilds the cache. Train / val partition of
+a word is decided by a stable hash of the word, so it does not change between rebuilds.
+'''
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import zlib
+
+import numpy as np
+import torch
+
+VAL_FRACTION = 0.02
+
+
+def content_hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+def file_hash(*filenames):
+    parts = []
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            parts.append(f.read())
+    return content_hash(*parts)
+
+def cache_dir(name, fname, max_len, vocab):
+    return os.path.expanduser(os.path.join('~/.cache', name, content_hash(os.path.abspath(fname), max_len, ' '.join(vocab))))
+
+def is_val(word, fraction=VAL_FRACTION):
+    '''
+    Stable train / val partition: the same word always goes to the same partition
+    '''
+    return zlib.crc32(word.encode('utf-8')) % 10_000 < fraction * 10_000
+
+def open_cache(dirname, lines, source):
+    '''
+    Returns lines that are not in the cache yet, or None if the cache is up to date
+    (its source hash is `source`).
+
+    If the cache has lines that are not in `lines` anymore, or it was not closed (interrupted
+    update), it is cleared and all lines are returned. Cache stays invalid until close_cache().
+    '''
+    state_file = os.path.join(dirname, 'state.json')
+    state = None
+    if os.path.isfile(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+        if state['source'] == source:
+            return None
+
+    cached = set()
+    if state is not None:
+        with open(os.path.join(dirname, 'lines.txt'), encoding='utf-8') as f:
+            cached = set(l.rstrip('\n') for l in f)
+        if not cached <= set(lines):
+            print(f'Source lines changed, rebuilding {dirname}')
+            state = None
+            cached = set()
+        else:
+            os.remove(state_file)
+
+    if state is None:
+        shutil.rmtree(dirname, ignore_errors=True)
+    os.makedirs(dirname, exist_ok=True)
+
+    return [l for l in lines if l not in cached]
+
+def close_cache(dirname, lines, source):
+    with open(os.path.join(dirname, 'lines.txt'), 'a', encoding='utf-8') as f:
+        for l in lines:
+            f.write(l + '\n')
+    with open(os.path.join(dirname, 'state.json.tmp'), 'w') as f:
+        json.dump({'source': source}, f)
+    os.replace(os.path.join(dirname, 'state.json.tmp'), os.path.join(dirname, 'state.json'))
+
+def has_arrays(dirname, names):
+    return all(os.path.isfile(os.path.join(dirname, f'{name}.npy')) for name in names)
+
+def save_arrays(dirname, **arrays):
+    os.makedirs(dirname, exist_ok=True)
+    for name, array in arrays.items():
+        filename = os.path.join(dirname, f'{name}.npy')
+        np.save(filename + '.tmp.npy', array)
+        os.replace(filename + '.tmp.npy', filename)
+
+def append_arrays(dirname, **arrays):
+    '''
+    Appends rows to the cached arrays (or saves them if there are none yet)
+    '''
+    if has_arrays(dirname, arrays):
+        cached = load_arrays(dirname, arrays)
+        arrays = {name: np.concatenate([cached[name], array]) for name, array in arrays.items()}
+    save_arrays(dirname, **arrays)
+
+def load_arrays(dirname, names):
+    return {
+        name: np.load(os.path.join(dirname, f'{name}.npy'), mmap_mode='r')
+        for name in names
+    }
+
+def indices(array, vocab_size):
+    '''
+    Narrows character indices (or lengths) to uint8
+    '''
+    if vocab_size > 256:
+        raise RuntimeError(f'Vocab too large for uint8 indices: {vocab_size}')
+    return array.astype(np.uint8)
+
+def positions(ai):
+    '''
+    Narrows accent positions to int8 (-1 is no accent, -100 is unknown accent)
+    '''
+    return np.asarray(ai).astype(np.int8)
+
+def collate(batch):
+    '''
+    Batch comes already expanded from dataset[indices]
+    '''
+    return batch
+
+def batch_loader(dataset, batch_size, *, shuffle, prefetch=False, buckets=None):
+    '''
+    DataLoader that fetches whole batches: dataset[indices], indices sorted for locality
+    of the memory-mapped reads (order within a batch does not matter for training).
+
+    buckets: if given, bucket key of every sample (see BucketBatchSampler)
+    '''
+    if buckets is not None:
+        sampler = BucketBatchSampler(buckets, batch_size, shuffle=shuffle)
+    else:
+        sampler = torch.utils.data.RandomSampler(dataset) if shuffle else torch.utils.data.SequentialSampler(dataset)
+        sampler = SortedBatchSampler(sampler, batch_size)
+    loader = torch.utils.data.DataLoader(
+        dataset,
+        sampler=sampler,
+        batch_size=None,
+        collate_fn=collate,
+    )
+    return Prefetcher(loader) if prefetch else loader
+
+class SortedBatchSampler(torch.utils.data.BatchSampler):
+    def __init__(self, sampler, batch_size):
+        super().__init__(sampler, batch_size, drop_last=False)
+
+    def __iter__(self):
+        for batch in super().__iter__():
+            yield sorted(batch)
+
+class BucketBatchSampler(torch.utils.data.Sampler):
+    '''
+    Batches of samples with the same bucket key (padded length). Samples of every bucket
+    are shuffled and cut into batches, and the batches of all buckets are shuffled.
+    Only the last batch of every bucket may be smaller than batch_size.
+    '''
+    def __init__(self, buckets, batch_size, *, shuffle=True):
+        buckets = np.asarray(buckets)
+        self.buckets = [np.flatnonzero(buckets == key) for key in np.unique(buckets)]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def __len__(self):
+        return sum(-(-len(bucket) // self.batch_size) for bucket in self.buckets)
+
+    def __iter__(self):
+        batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = bucket[torch.randperm(len(bucket)).numpy()]
+            for i in range(0, len(bucket), self.batch_size):
+                batches.append(sorted(bucket[i:i + self.batch_size].tolist()))
+
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        return iter(batches)
+
+class Prefetcher:
+    '''
+    Iterates the loader on a background thread, keeping up to `depth` batches ready
+    '''
+    _END = object()
+
+    def __init__(self, loader, depth=2):
+        self.loader = loader
+        self.depth = depth
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        batches = queue.Queue(self.depth)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def run():
+            try:
+                for batch in self.loader:
+                    if not put(batch):
+                        return
+                put(self._END)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is self._END:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            thread.join()
+
+def expand(array):
+    return torch.from_numpy(np.asarray(array, dtype=np.int64))
+
+def one_hot(position, max_len):
+    '''
+    Expands accent position(s) to [..., max_len] int64 one-hot tensor.
+    No accent (-1) gives all zeros, unknown accent (-100) gives all -100 (ignored by the loss).
+    '''
+    position = np.asarray(position, dtype=np.int64)
+    out = (np.arange(max_len) == position[..., None]).astype(np.int64)
+    out[position == -100] = -100
+    return torch.from_numpy(out)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from translator.batching import MAX_LEN
+
+ACCENT = -1
+UNKNOWN = -2
+
+
+class Encoder:
+    '''
+    Encodes a batch of words to padded model inputs, without a per-character Python loop.
+
+    Words are converted to a UTF-32 array and every code point is mapped to the vocabulary
+    index with a lookup table. Lower-casing, character replacement (e.g. э -> е) and accent
+    extraction are all folded into the table, hence are done in the same pass.
+
+    vocab: dictionary of character -> index, index 0 is padding
+    accents: if True, accent marks (\\u0301 and "'") are removed from the input and their
+        positions are returned as accent hints (first accent of a word is used). A string
+        sets the accent marks, e.g. '\\u0301' when "'" is a vocabulary character
+    replace: dictionary of character -> vocab character to use instead
+    '''
+
+    def __init__(self, vocab, *, max_len=MAX_LEN, accents=False, replace=None):
+        self.max_len = max_len
+
+        chars = {c: i for c, i in vocab.items() if len(c) == 1}
+        for c, i in list(chars.items()):
+            for x in (c.lower(), c.upper()):
+                if len(x) == 1:
+                    chars.setdefault(x, i)
+        for c, x in (replace or {}).items():
+            chars[c] = chars[c.upper()] = vocab[x]
+        if accents is True:
+            accents = '\u0301' + "'"
+        for c in accents or '':
+            chars[c] = ACCENT
+
+        self._table = np.full(max(ord(c) for c in chars) + 1, UNKNOWN, dtype=np.int32)
+        for c, i in chars.items():
+            self._table[ord(c)] = i
+
+    def __call__(self, words):
+        '''
+        Returns (inputs, lengths, accents) arrays: [B, max_len], [B] and [B, max_len], all int32.
+        Words longer than max_len are truncated.
+        '''
+        inputs = np.zeros((len(words), self.max_len), dtype=np.int32)
+        lengths = np.zeros((len(words),), dtype=np.int32)
+        accents = np.zeros((len(words), self.max_len), dtype=np.int32)
+        if not words:
+            return inputs, lengths, accents
+
+        words = np.array(words, dtype=str)
+        codepoints = words.view(np.uint32).reshape(len(words), -1)
+        codes = self._table[np.minimum(codepoints, len(self._table) - 1)]
+        codes[codepoints >= len(self._table)] = UNKNOWN
+        codes[codepoints == 0] = 0
+
+        if (codes == UNKNOWN).any():
+            row, col = np.argwhere(codes == UNKNOWN)[0]
+            raise ValueError(f'input text contains unsupported character {words[row][col]!r}: {words[row]}')
+
+        is_accent = codes == ACCENT
+        if not is_accent.any():
+            codes = codes[:, :self.max_len]
+            inputs[:, :codes.shape[1]] = codes
+            lengths[:] = (codes > 0).sum(axis=1)
+            return inputs, lengths, accents
+
+        rows = np.flatnonzero(is_accent.any(axis=1))
+        # position of the accented character: first accent mark goes right after it
+        position = is_accent[rows].argmax(axis=1) - 1
+        valid = (position >= 0) & (position < self.max_len)
+        accents[rows[valid], position[valid]] = 1
+
+        # remove accent marks, shifting the rest of the characters to the left
+        keep = codes > 0
+        positions = np.cumsum(keep, axis=1) - 1
+        keep &= positions < self.max_len
+        row, col = np.nonzero(keep)
+        inputs[row, positions[row, col]] = codes[row, col]
+        lengths[:] = keep.sum(axis=1)
+
+        return inputs, lengths, accents
@@ -2,6 +2,9 @@ import lightning as L
 import torch
 import torch.nn.functional as F
 
+from translator.batching import padded_length
+from translator.conv_encoder import make_encoder
+
 
 class Model(L.LightningModule):
 
@@ -9,20 +12,28 @@ class Model(L.LightningModule):
         emb_dim=64,
         hidden_dim=128,
         dropout=0.1,
+        encoder='gru',
+        upsample='before',
     ):
         super().__init__()
         self.vocab_size = vocab_size
         self.max_seq_len = max_seq_len
         self.emb_dim = emb_dim
         self.hidden_dim = hidden_dim
+        self.encoder = encoder
+        self.upsample_mode = upsample
 
         self.embed = torch.nn.Embedding(self.vocab_size, self.emb_dim)
         self.embed_accent = torch.nn.Embedding(2, self.emb_dim)  # just yes/no
-        self.upsample = torch.nn.Upsample(scale_factor=2, mode='nearest')
-        self.lstm = torch.nn.GRU(self.emb_dim, self.hidden_dim, bidirectional=True, batch_first=True, num_layers=3, dropout=dropout)
-        # self.conv1 = torch.nn.Conv1d(self.emb_dim, self.hidden_dim, 3, padding=1)
-        # self.conv2 = torch.nn.Conv1d(self.hidden_dim, self.hidden_dim, 3, padding=1)
-        # self.conv3 = torch.nn.Conv1d(self.hidden_dim, self.hidden_dim, 3, padding=1)
+        self.lstm = make_encoder(encoder, self.emb_dim, self.hidden_dim, dropout=dropout)  # GRU or ConvEncoder
+        if upsample == 'before':
+            # encoder runs over 2S frames
+            self.upsample = torch.nn.Upsample(scale_factor=2, mode='nearest')
+        elif upsample == 'after':
+            # encoder runs over S positions, every position is projected to two output frames
+            self.expand = torch.nn.Linear(self.hidden_dim * 2, self.hidden_dim * 4)
+        else:
+            raise ValueError(f'unknown upsample mode: {upsample}')
 
         self.ff1 = torch.nn.Linear(self.hidden_dim * 2, self.hidden_dim * 4)
         self.dropout = torch.nn.Dropout(dropout)
@@ -36,29 +47,37 @@ class Model(L.LightningModule):
         lengths: [B] int64
         '''
         x = self.embed(x) + self.embed_accent(a) # [B, S, E]
-        x = self.upsample(x.transpose(1,2)).transpose(1,2)  # [B, 2S, E]
+        if self.upsample_mode == 'before':
+            x = self.upsample(x.transpose(1,2)).transpose(1,2)  # [B, 2S, E]
         x = self.dropout(x)
         x, _ = self.lstm(x)
+        if self.upsample_mode == 'after':
+            x = self.expand(x)  # [B, S, 2 * 2H]
+            x = x.reshape(x.shape[0], x.shape[1] * 2, self.hidden_dim * 2)  # [B, 2S, 2H]
         x = self.ff1(x)
         x = F.relu(x)
         x = self.dropout(x)
-        x = self.ff2(x)   # [B, 3S, V]
+        x = self.ff2(x)   # [B, 2S, V]
         x = F.log_softmax(x, dim=-1)
         return x
 
-    def training_step(self, batch, batch_idx):
-        logits = self.forward(batch['ru'], batch['ru_acc'], batch['ru_len'])
+    def _step(self, batch):
+        # batch holds words of one padded length (see translator.batching) and is trimmed to
+        # it, so every word is padded as at inference. Targets longer than that keep their
+        # length: 2 frames per position always fit a CTC path of the target
+        seq_len = max(padded_length(int(batch['ru_len'].max()), max_len=batch['ru'].shape[1]), int(batch['cu_len'].max()))
+        logits = self.forward(batch['ru'][:, :seq_len], batch['ru_acc'][:, :seq_len], batch['ru_len'])
         logits = logits.transpose(0, 1)
         input_lens = torch.full(size=(logits.shape[1],), fill_value=logits.shape[0], dtype=torch.long, device=logits.device)
-        loss = self.loss(logits, batch['cu'], input_lens.detach(), batch['cu_len'].detach())
+        return self.loss(logits, batch['cu'][:, :seq_len], input_lens.detach(), batch['cu_len'].detach())
+
+    def training_step(self, batch, batch_idx):
+        loss = self._step(batch)
         self.log('train_loss', loss, prog_bar=True)
         return loss
 
     def validation_step(self, batch, batch_idx):
-        logits = self.forward(batch['ru'], batch['ru_acc'], batch['ru_len'])
-        logits = logits.transpose(0, 1)
-        input_lens = torch.full(size=(logits.shape[1],), fill_value=logits.shape[0], dtype=torch.long, device=logits.device)
-        loss = self.loss(logits, batch['cu'], input_lens.detach(), batch['cu_len'].detach())
+        loss = self._step(batch)
         self.log('val_loss', loss, prog_bar=True)
 
     def configure_optimizers(self):
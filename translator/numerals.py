@@ -0,0 +1,134 @@
+'''
+Support for Cyrillic Numerals (port of cu_format_int from ui/src/numerals.js)
+See UTN 41 for implementation information
+http://www.unicode.org/notes/tn41/
+'''
+CU_THOUSAND = '\u0482'
+CU_TITLO = '\u0483'
+CU_800 = '\u047f'
+CU_NBSP = '\u00a0'
+
+CU_NUMBER = {
+    '\u0446': 900,
+    '\u047f': 800,
+    '\u0471': 700,
+    '\u0445': 600,
+    '\u0444': 500,
+    '\u0443': 400,
+    '\u0442': 300,
+    '\u0441': 200,
+    '\u0440': 100,
+    '\u0447': 90,
+    '\u043f': 80,
+    '\u047b': 70,
+    '\u046f': 60,
+    '\u043d': 50,
+    '\u043c': 40,
+    '\u043b': 30,
+    '\u043a': 20,
+    '\u0456': 10,
+    '\u0473': 9,
+    '\u0438': 8,
+    '\u0437': 7,
+    '\u0455': 6,
+    '\u0454': 5,
+    '\u0434': 4,
+    '\u0433': 3,
+    '\u0432': 2,
+    '\u0430': 1,
+}
+
+CU_DIGIT = { v: k for k,v in CU_NUMBER.items() }
+
+
+def cu_format_int(value, add_titlo=True, dialect='standard'):
+    '''
+    Formats an integer value as Church Slavonic number (string).
+
+    add_titlo: if True (default), adds titlo.
+    dialect: controls how large numbers are generated, "standard" (default) or "old".
+    '''
+    if dialect not in ('standard', 'old'):
+        raise ValueError(f'unknown dialect "{dialect}", expected one of: ["old", "standard"]')
+
+    if value < 0:
+        return '-' + cu_format_int(-value, add_titlo=add_titlo, dialect=dialect)
+
+    if value == 0:
+        return '0' + CU_TITLO if add_titlo else '0'
+
+    groups = _format_thousand_groups(value)
+    if len(groups) > 1:
+        if len(groups[-2]) == 1:
+            # merge groups -1 and -2, because only a single digit in groups[-2]
+            groups[-2] = groups[-2] + groups[-1]
+            groups[-1] = ''
+        elif len(groups[-2]) > 1 and (len(groups[-1]) == 0 or dialect == 'old'):
+            # force thousand symbol before every digit in groups[-2]
+            groups[-2] = CU_THOUSAND.join(groups[-2])
+            if dialect == 'old':
+                groups[-2] += groups[-1]
+                groups[-1] = ''
+
+    if add_titlo:
+        groups = [_place_titlo(x) for x in groups]
+
+    # add leading thousand signs. Last group gets none, last but one gets one, etc
+    out = [
+        CU_THOUSAND * (len(groups) - 1 - i) + group
+        for i,group in enumerate(groups)
+        if group
+    ]
+
+    return CU_NBSP.join(out)
+
+def _format_small_number(value):
+    # Deals with numbers in the range 0...999 inclusively
+    if not 0 <= value < 1000:
+        raise ValueError(f'Bad input: {value}')
+
+    hundreds = 100 * (value // 100)
+    value -= hundreds
+    tens = 10 * (value // 10)
+    value -= tens
+
+    out = []
+    if hundreds > 0:
+        out.append(CU_DIGIT[hundreds])
+    if tens == 10:
+        # numbers between 11..19 (inclusive) use reverse order of digits due
+        # to pronunciation rules (digit order in Church Slavonic follows pronunciation)
+        if value > 0:
+            out.append(CU_DIGIT[value])
+        out.append(CU_DIGIT[tens])
+    else:
+        if tens > 0:
+            out.append(CU_DIGIT[tens])
+        if value > 0:
+            out.append(CU_DIGIT[value])
+
+    return ''.join(out)
+
+def _format_thousand_groups(value):
+    # Returns groups of thousands as a list, e.g. 123456789 is split into
+    # 123 456 789 and each group is formatted as a Church Slavonic number string
+    groups = []
+    while value > 0:
+        groups.append(_format_small_number(value % 1000))
+        value //= 1000
+
+    return groups[::-1]
+
+def _place_titlo(numstring):
+    if len(numstring) == 0:
+        return numstring  # nothing to do
+
+    if len(numstring) > 1:
+        if numstring[-2] != CU_THOUSAND:
+            if numstring[-2] != CU_800:
+                return numstring[:-1] + CU_TITLO + numstring[-1]
+        elif len(numstring) > 2:
+            if numstring[-3] != CU_THOUSAND and numstring[-3] != CU_800:  # e.g. not "##a"
+                return numstring[:-2] + CU_TITLO + numstring[-2:]
+
+    return numstring + CU_TITLO
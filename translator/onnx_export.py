@@ -1,11 +1,15 @@
 import torch
+from translator.batching import run_buckets
 from translator.translator_dataset import TranslatorDataset
 from translator.model import Model
+from translator.ctc_decoder import CTCDecoder
+from translator.encoder import Encoder
+from translator.quantize import print_review, quantize_and_review, review_models
+from translator.review import review
+from translator.session import create_session
 import onnx
 import json
-import onnxruntime as ort
 import numpy as np
-from pyctcdecode import build_ctcdecoder
 
 
 datamodule = TranslatorDataset()
@@ -14,12 +18,14 @@ datamodule.setup()
 
 vocab = datamodule.vocab
 
-def to_onnx(model_checkpoint='model.ckpt', onnx_filename='model.onnx'):
+def to_onnx(model_checkpoint='model.ckpt', onnx_filename='model.onnx', encoder='gru', upsample='before'):
 
     model = Model.load_from_checkpoint(
         model_checkpoint    ,
         vocab_size=datamodule.vocab_size,
         max_seq_len=32,
+        encoder=encoder,
+        upsample=upsample,
     )
 
     model.eval()
@@ -37,9 +43,9 @@ def to_onnx(model_checkpoint='model.ckpt', onnx_filename='model.onnx'):
         input_names = ('inputs', 'accents'),
         output_names = ('logits',),
         dynamic_axes = {
-            'inputs' : { 0: 'batch_size' },
-            'accents': { 0: 'batch_size' },
-            'logits' : { 0: 'batch_size' },
+            'inputs' : { 0: 'batch_size', 1: 'seq_len' },
+            'accents': { 0: 'batch_size', 1: 'seq_len' },
+            'logits' : { 0: 'batch_size', 1: 'logits_len' },
         }
     )
 
@@ -47,7 +53,7 @@ def to_onnx(model_checkpoint='model.ckpt', onnx_filename='model.onnx'):
         json.dump(vocab, f)
 
     # Load the ONNX model
-    onnx_model = onnx.load('model.onnx')
+    onnx_model = onnx.load(onnx_filename)
 
     # Check that the model is well formed
     onnx.checker.check_model(onnx_model)
@@ -59,13 +65,9 @@ def to_onnx(model_checkpoint='model.ckpt', onnx_filename='model.onnx'):
     print(torch_logits)
 
 def sample(onnx_model, words=['лепота', 'несть']):
-    session = ort.InferenceSession('model.onnx')
+    session = create_session(onnx_model, cache=False)
 
-    inputs = np.zeros((len(words), 32), dtype=np.int32)
-    accents = np.zeros((len(words), 32), dtype=np.int32)
-    for i,word in enumerate(words):
-        for j,c in enumerate(word):
-            inputs[i, j] = vocab[c]
+    inputs, _, accents = Encoder(vocab, accents=True, replace={'э': 'е'})(words)
 
     logits = session.run(None, {
         'inputs': inputs,
@@ -77,18 +79,24 @@ def sample(onnx_model, words=['лепота', 'несть']):
     assert labels[0] == '<pad>'
     labels[0] = ''
 
-    # prepare decoder and decode logits via shallow fusion
-    decoder = build_ctcdecoder(
-        labels,
-        # kenlm_model,
-        # alpha=0.5,  # tuned on a val set
-        # beta=1.0,  # tuned on a val set
-    )
+    decoder = CTCDecoder(labels)
+
+    for word, out in zip(words, decoder(logits)):
+        print(word, '==>', out)
+
+def evaluate(session):
+    def predict(ru, ru_acc, ru_len):
+        return session.run(None, {
+            'inputs': ru.numpy().astype(np.int32),
+            'accents': ru_acc.numpy().astype(np.int32),
+        })[0]
+    return review(predict, datamodule, verbose=False)['error_rate']
 
-    for l,word in zip(logits, words):
-        out = decoder.decode_beams(l)
-        print(word)
-        print(out)
+def evaluate_bucketed(session):
+    def predict(ru, ru_acc, ru_len):
+        return run_buckets(lambda x: session.run(None, {'inputs': x[0], 'accents': x[1]})[0],
+            ru_len.numpy(), [ru.numpy().astype(np.int32), ru_acc.numpy().astype(np.int32)], blank=0)
+    return review(predict, datamodule, verbose=False)['error_rate']
 
 
 if __name__ == '__main__':
@@ -97,7 +105,22 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Converts model to ONNX')
     parser.add_argument('-i', '--input', default='model.ckpt', help='Input file with Lightning checkpoint')
     parser.add_argument('-o', '--output', default='model.onnx', help='File name of the output ONNX file')
+    parser.add_argument('-q', '--quantize', action='store_true', help='Also create INT8 weight variant and compare it with the float model on the validation split')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='Max allowed increase of the error rate of the INT8 model (default is 0.005)')
+    parser.add_argument('--padding', action='store_true', help='Compare error rates with full 32 padding and with length buckets (as predictors run the model) on the validation split')
+    parser.add_argument('-a', '--encoder', choices=['gru', 'conv'], default='gru', help='Encoder architecture the model was trained with (default is "gru")')
+    parser.add_argument('-u', '--upsample', choices=['before', 'after'], default='before', help='Upsample mode the model was trained with (default is "before")')
+    parser.add_argument('--compare', metavar='ONNX', help='Compare latency and error rate with this model (e.g. the GRU one) on the validation split')
 
     args = parser.parse_args()
 
-    to_onnx(args.input, args.output)
\ No newline at end of file
+    to_onnx(args.input, args.output, args.encoder, args.upsample)
+
+    if args.compare:
+        print_review(['compared', args.encoder], review_models([args.compare, args.output], evaluate))
+
+    if args.padding:
+        print_review(['full', 'bucketed'], review_models([args.output], evaluate) + review_models([args.output], evaluate_bucketed))
+
+    if args.quantize and not quantize_and_review(args.output, evaluate, args.tolerance):
+        parser.exit(1)
\ No newline at end of file
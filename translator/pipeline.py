@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+
+from accent.predictor import MLPredictor as AccentPredictor
+from accent.predictor import VocabPredictor as CheatMap
+from accent.predictor import num_vowels
+from translator.batching import groups, sequence_length
+from translator.cache import CachedPredictor
+from translator.ctc_decoder import CTCDecoder
+from translator.encoder import Encoder
+from translator.predictor import Predictor, VocabPredictor, normalize
+from translator.session import create_session
+
+
+class Pipeline:
+    '''
+    Translates civic words to Church Slavonic, using the accent model to produce accent hints
+    for the translator model (translation with a hint is much more accurate).
+
+    Words are looked up in the dictionary first. For the rest, words without explicit accent
+    get accent from the accent cheat map, or from model-accent.onnx (all of them in one run;
+    the model may be exported with or without in-graph accent decision).
+    Then the same encoded batch, with predicted accents as the `accents` input, goes through
+    model.onnx.
+    '''
+    RE = Predictor.RE
+
+    def __init__(self, onnx_model, vocab, data_dict, accent_model, accent_vocab, accent_data, *, threads=None):
+        self._session = create_session(onnx_model, threads=threads)
+        self._seq_len = sequence_length(self._session)
+        self._accent_predictor = AccentPredictor(accent_model, accent_vocab, threads=threads)
+
+        with open(vocab) as f:
+            vocab = json.load(f)
+        with open(accent_vocab) as f:
+            accent_vocab = json.load(f)
+
+        # words are encoded once, with accent model vocab. Translator vocab is a superset of
+        # it, so translator inputs are obtained by re-mapping the indices
+        self._encoder = Encoder(accent_vocab, accents=True, replace={'э': 'е'})
+        self._remap = np.zeros(len(accent_vocab), dtype=np.int32)
+        for c, i in accent_vocab.items():
+            self._remap[i] = vocab[c]
+
+        labels = list(vocab.keys())
+        assert labels[0] == '<pad>'
+        labels[0] = ''
+        self._decoder = CTCDecoder(labels)
+
+        self._vocab_predictor = VocabPredictor(data_dict)
+        self._cheat_map = CheatMap(accent_data)
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        words = [normalize(word) for word in words]
+
+        predictions = {}
+        misses = []
+        for word in dict.fromkeys(words):
+            prediction = self._vocab_predictor(word)
+            if prediction is None:
+                misses.append(word)
+            else:
+                predictions[word] = prediction
+        predictions.update(zip(misses, self.translate(misses)))
+
+        return [predictions[word] for word in words]
+
+    def translate(self, words):
+        '''
+        Translates words with the model (no dictionary lookup)
+        '''
+        if not words:
+            return []
+
+        inputs, lengths, accents = self._encoder(words)
+
+        # accent hints: explicit, from the cheat map, or predicted
+        unaccented = []
+        for i,word in enumerate(words):
+            if accents[i].any() or num_vowels(word) < 2:
+                continue
+            index = self._cheat_map.index(word)
+            if index is None:
+                unaccented.append(i)
+            elif index < lengths[i]:
+                accents[i, index] = 1
+
+        unaccented = np.array(unaccented, dtype=np.int64)
+        if len(unaccented):
+            accent = self._accent_predictor.indices(inputs[unaccented], lengths[unaccented])
+            has_accent = accent >= 0
+            accents[unaccented[has_accent], accent[has_accent]] = 1
+
+        inputs = self._remap[inputs]
+
+        out = [None] * len(words)
+        for seq_len, rows in groups(lengths, self._seq_len):
+            logits = self._session.run(None, {
+                'inputs': inputs[rows, :seq_len],
+                'accents': accents[rows, :seq_len],
+            })[0]
+            for i, text in zip(rows, self._decoder(logits)):
+                out[i] = text
+
+        return out
+
+def sample(onnx_model, vocab, data, accent_model, accent_vocab, accent_data,
+        words=['лепота', 'несть', 'Господи', 'помилуй', 'преподобнейший', 'свят\'аго'], cache=None):
+    predictor = Pipeline(onnx_model, vocab, data, accent_model, accent_vocab, accent_data)
+    if cache is not None:
+        predictor = CachedPredictor(predictor, filename=cache)
+    for word, predicted in zip(words, predictor.batch(words)):
+        print(word, '==>', predicted)
+
+    if cache is not None:
+        print(predictor.stats())
+        predictor.close()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Translates civic words to Church Slavonic, with predicted accent hints')
+    parser.add_argument('-m', '--model', default='model.onnx', help='File name of the model ONNX file')
+    parser.add_argument('-v', '--vocab', default='vocab.json', help='File name of the vocab JSON file')
+    parser.add_argument('-d', '--data',  default='data/cu-words-civic-dedup.txt', help='File name of the civic to CU dictionary file')
+    parser.add_argument('--accent-model', default='model-accent.onnx', help='File name of the accent ONNX file')
+    parser.add_argument('--accent-vocab', default='vocab-accent.json', help='File name of the accent vocab JSON file')
+    parser.add_argument('--accent-data', default='data/cu-words-civic-dedup-accent.txt', help='File name of the accent cheat map file')
+    parser.add_argument('-c', '--cache', help='File name of the on-disk prediction cache (default is no disk cache)')
+
+    args = parser.parse_args()
+
+    sample(args.model, args.vocab, args.data, args.accent_model, args.accent_vocab, args.accent_data, cache=args.cache)
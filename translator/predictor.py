@@ -0,0 +1,120 @@
+import json
+
+from translator.batching import groups, sequence_length
+from translator.cache import CachedPredictor
+from translator.ctc_decoder import CTCDecoder
+from translator.encoder import Encoder
+from translator.session import create_session
+
+
+class Predictor:
+    RE = "[абвгдежзийклмнопрстуфхцчшщьыъэюя'\u0301]+"
+
+    def __init__(self, onnx_model, vocab, data_dict, *, threads=None):
+        self._ml_predictor = MLPredictor(onnx_model, vocab, threads=threads)
+        self._vocab_predictor = VocabPredictor(data_dict)
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        '''
+        Translates a list of civic words. Words are deduplicated, looked up in the
+        dictionary, and all misses are sent to the model in a single run.
+        '''
+        words = [normalize(word) for word in words]
+
+        predictions = {}
+        misses = []
+        for word in dict.fromkeys(words):
+            prediction = self._vocab_predictor(word)
+            if prediction is None:
+                misses.append(word)
+            else:
+                predictions[word] = prediction
+        predictions.update(zip(misses, self._ml_predictor.batch(misses)))
+
+        return [predictions[word] for word in words]
+
+class MLPredictor:
+
+    def __init__(self, onnx_model, vocab, *, threads=None):
+        self._session = create_session(onnx_model, threads=threads)
+        self._seq_len = sequence_length(self._session)
+
+        with open(vocab) as f:
+            self._vocab = json.load(f)
+
+        # specify alphabet labels as they appear in logits
+        labels = list(self._vocab.keys())
+        assert labels[0] == '<pad>'
+        labels[0] = ''
+        self._decoder = CTCDecoder(labels)
+        self._encoder = Encoder(self._vocab, accents=True, replace={'э': 'е'})
+
+    def __call__(self, word):
+        return self.batch([word])[0]
+
+    def batch(self, words):
+        if not words:
+            return []
+
+        inputs, lengths, accents = self._encoder(words)
+
+        out = [None] * len(words)
+        for seq_len, rows in groups(lengths, self._seq_len):
+            logits = self._session.run(None, {
+                'inputs': inputs[rows, :seq_len],
+                'accents': accents[rows, :seq_len],
+            })[0]
+            for i, text in zip(rows, self._decoder(logits)):
+                out[i] = text
+
+        return out
+
+def normalize(word):
+    return word.lower().replace("'", '\u0301')
+
+class VocabPredictor:
+    def __init__(self, data_dict):
+        with open(data_dict, encoding='utf-8') as f:
+            pairs = [l.strip().split('\t')[:2] for l in f if l.strip()]
+        self._data = {}
+        for cu, ru in pairs:
+            self._data[ru] = cu
+
+        # some unaccented RU entries in the corpus are mapped to unaccented CU
+        # (свѧтагѡ -> святаго). We prefer accented version, hence overwrite here...
+        # but short single-syllable words, like ни, и, etc should be left unaccented!
+        for ru, cu in list(self._data.items()):
+            ru_no_accent = ru.replace('\u0301', '')
+            if ru != ru_no_accent and len(ru_no_accent) > 2:
+                self._data[ru_no_accent] = cu
+        print(f'Loaded: {len(self._data)} dictionary words')
+
+    def __call__(self, word):
+        return self._data.get(word.lower())
+
+def sample(onnx_model, vocab, data, words=['лепота', 'несть', 'Господи', 'помилуй', 'свят\'аго', 'лепота'], cache=None):
+    predictor = Predictor(onnx_model, vocab, data)
+    if cache is not None:
+        predictor = CachedPredictor(predictor, filename=cache)
+    for word, predicted in zip(words, predictor.batch(words)):
+        print(word, '==>', predicted)
+
+    if cache is not None:
+        print(predictor.stats())
+        predictor.close()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Translates civic words to Church Slavonic')
+    parser.add_argument('-m', '--model', default='model.onnx', help='File name of the model ONNX file')
+    parser.add_argument('-v', '--vocab', default='vocab.json', help='File name of the vocab JSON file')
+    parser.add_argument('-d', '--data',  default='data/cu-words-civic-dedup.txt', help='File name of the civic to CU dictionary file')
+    parser.add_argument('-c', '--cache', help='File name of the on-disk prediction cache (default is no disk cache)')
+
+    args = parser.parse_args()
+
+    sample(args.model, args.vocab, args.data, cache=args.cache)
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper, version_converter
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+from translator.session import create_session
+
+QUANTIZED_OPSET = 11  # ORT quantizer needs at least 11, our models are exported with opset 9
+
+
+def int8_filename(onnx_filename):
+    root, ext = os.path.splitext(onnx_filename)
+    return f'{root}-int8{ext}'
+
+def quantize(onnx_filename, quantized_filename):
+    '''
+    Creates INT8 weight variant of the model.
+
+    MatMul and Gather weights are quantized with ORT dynamic quantization. ORT has no
+    quantized GRU, so GRU weights are stored as INT8 and dequantized when session
+    is created (constant folding). Most of the model weight is in the GRU.
+    '''
+    model = version_converter.convert_version(onnx.load(onnx_filename), QUANTIZED_OPSET)
+    with tempfile.TemporaryDirectory() as tmp:
+        converted = os.path.join(tmp, 'model.onnx')
+        onnx.save(model, converted)
+        quantize_dynamic(converted, quantized_filename, weight_type=QuantType.QInt8)
+
+    model = onnx.load(quantized_filename)
+    quantize_gru_weights(model)
+    onnx.checker.check_model(model)
+    onnx.save(model, quantized_filename)
+
+def quantize_gru_weights(model):
+    initializers = { x.name: x for x in model.graph.initializer }
+    dequantize = []
+    for node in model.graph.node:
+        if node.op_type != 'GRU':
+            continue
+        for name in node.input[1:3]:  # W and R
+            if name not in initializers:
+                continue
+            initializer = initializers.pop(name)
+            model.graph.initializer.remove(initializer)
+            w = numpy_helper.to_array(initializer)
+            scale = np.float32(np.abs(w).max() / 127) or np.float32(1.)
+            model.graph.initializer.extend([
+                numpy_helper.from_array(np.round(w / scale).astype(np.int8), f'{name}_quantized'),
+                numpy_helper.from_array(np.array(scale, dtype=np.float32), f'{name}_scale'),
+                numpy_helper.from_array(np.array(0, dtype=np.int8), f'{name}_zero_point'),
+            ])
+            dequantize.append(helper.make_node(
+                'DequantizeLinear',
+                [f'{name}_quantized', f'{name}_scale', f'{name}_zero_point'],
+                [name],
+            ))
+
+    nodes = dequantize + list(model.graph.node)
+    del model.graph.node[:]
+    model.graph.node.extend(nodes)
+
+class TimedSession:
+    '''
+    Inference session that keeps track of the time spent in `run()`
+    '''
+    def __init__(self, onnx_model):
+        self._session = create_session(onnx_model, cache=False)
+        self.elapsed = 0.
+        self.calls = 0
+
+    def run(self, output_names, input_feed):
+        start = time.perf_counter()
+        out = self._session.run(output_names, input_feed)
+        self.elapsed += time.perf_counter() - start
+        self.calls += 1
+        return out
+
+def review_models(onnx_filenames, evaluate):
+    '''
+    Runs the validation split through every model.
+
+    evaluate(session) must return the error rate. Returns a list of dictionaries with
+    file size, mean latency of one batch and error rate.
+    '''
+    results = []
+    for filename in onnx_filenames:
+        session = TimedSession(filename)
+        error_rate = evaluate(session)
+        results.append({
+            'size': os.path.getsize(filename),
+            'latency': session.elapsed / max(session.calls, 1),
+            'error_rate': error_rate,
+        })
+    return results
+
+def print_review(names, results):
+    '''
+    Prints results of `review_models` side by side, with the delta of the last one
+    '''
+    first, last = results[0], results[-1]
+    print(f'{"":12}' + ''.join(f' {name:>12}' for name in names) + f' {"delta":>12}')
+    print(f'{"size, KB":12}' + ''.join(f' {r["size"] / 1024:12.1f}' for r in results) + f' {(last["size"] - first["size"]) / 1024:+12.1f}')
+    print(f'{"batch, ms":12}' + ''.join(f' {r["latency"] * 1000:12.2f}' for r in results) + f' {(last["latency"] - first["latency"]) * 1000:+12.2f}')
+    print(f'{"error rate":12}' + ''.join(f' {r["error_rate"]:12.4f}' for r in results) + f' {last["error_rate"] - first["error_rate"]:+12.4f}')
+
+def quantize_and_review(onnx_filename, evaluate, tolerance):
+    '''
+    Quantizes the model and runs the validation split through both variants.
+
+    evaluate(session) must return the error rate. Quantized model is kept only
+    if its error rate is within `tolerance` of the float one.
+    '''
+    quantized_filename = int8_filename(onnx_filename)
+    quantize(onnx_filename, quantized_filename)
+
+    fp32, int8 = review_models([onnx_filename, quantized_filename], evaluate)
+    print_review(['float', 'int8'], [fp32, int8])
+
+    if int8['error_rate'] - fp32['error_rate'] > tolerance:
+        print(f'Quantized model error rate is out of tolerance ({tolerance}), removing {quantized_filename}')
+        os.remove(quantized_filename)
+        return False
+
+    print(f'Saved quantized model as {quantized_filename}')
+    return True
@@ -0,0 +1,306 @@
+'''
+Local HTTP inference service for the translator and both accent models.
+
+    python -m translator.server --port 8000
+
+    curl -d '{"words": ["лепота", "несть"]}' http://localhost:8000/translate
+    curl -d '{"words": ["лепота", "несть"]}' http://localhost:8000/accent
+    curl -d '{"words": ["красота", "дети"]}' http://localhost:8000/stress
+    curl http://localhost:8000/stats
+
+Concurrent requests to the same endpoint are coalesced into one batched model call:
+the first request opens a batch, which is run when the next request would not fit
+into `max_batch` words or `max_wait` seconds have passed. The request that does not
+fit and requests arriving while a batch is running go into the next one. A request
+larger than `max_batch` is split across several model calls. When the queue is full,
+requests are rejected with 503 (Service Unavailable) right away.
+'''
+import asyncio
+import concurrent.futures
+import json
+import re
+import time
+
+MAX_BATCH = 256  # words
+MAX_WAIT = 0.005  # seconds
+MAX_QUEUE = 1024  # requests
+MAX_BODY = 1024 * 1024  # bytes
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class Overloaded(Exception):
+    pass
+
+class MicroBatcher:
+    '''
+    Coalesces concurrent requests into batched calls of `predict(words)`.
+
+    Each request is a list of words. Model runs in a dedicated worker thread,
+    one batch at a time, so the event loop is never blocked.
+    '''
+
+    def __init__(self, predict, *, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_queue=MAX_QUEUE):
+        self._predict = predict
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._queue = asyncio.Queue(max_queue)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        self.requests = 0
+        self.batches = 0
+        self.words = 0
+        self.rejected = 0
+        self.elapsed = 0.
+
+    async def submit(self, words):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((words, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded('too many pending requests') from None
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            batch = [pending if pending is not None else await self._queue.get()]
+            pending = None
+            size = len(batch[0][0])
+            deadline = loop.time() + self._max_wait
+            while size < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self._max_batch:
+                    pending = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        # requests dropped by their clients while waiting
+        batch = [(words, future) for words, future in batch if not future.done()]
+        if not batch:
+            return
+        words = [word for request, _ in batch for word in request]
+
+        start = time.perf_counter()
+        try:
+            results = []
+            for i in range(0, len(words), self._max_batch):
+                results += await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._predict, words[i:i + self._max_batch])
+                self.batches += 1
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+        self.requests += len(batch)
+        self.words += len(words)
+
+        offset = 0
+        for request, future in batch:
+            if not future.done():
+                future.set_result(results[offset:offset + len(request)])
+            offset += len(request)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'words': self.words,
+            'rejected': self.rejected,
+            'queued': self._queue.qsize(),
+            'words_per_batch': self.words / max(1, self.batches),
+            'ms_per_batch': 1000 * self.elapsed / max(1, self.batches),
+        }
+
+class Server:
+    '''
+    Minimal HTTP/1.1 server (keep-alive, JSON in and out) on top of asyncio streams.
+
+    endpoints: dictionary of name -> (predictor, regex of a valid word). Predictor must
+    have `batch(words)` method, its `stats()` (if any) are reported by /stats. Every
+    word of a request is checked against the regex, so that one bad word does not
+    fail the whole batch it would be coalesced into.
+    '''
+
+    def __init__(self, endpoints, *, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_queue=MAX_QUEUE):
+        self._endpoints = {
+            '/' + name: (
+                MicroBatcher(predictor.batch, max_batch=max_batch, max_wait=max_wait, max_queue=max_queue),
+                re.compile(regex, flags=re.IGNORECASE),
+                predictor,
+            )
+            for name, (predictor, regex) in endpoints.items()
+        }
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self._tasks = [asyncio.create_task(batcher.run()) for batcher, _, _ in self._endpoints.values()]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': 'request is too large'}, close=True)
+                    break
+                body = await reader.readexactly(length)
+
+                status, payload = await self.handle(method, path, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self._respond(writer, status, payload, close=close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, method, path, body):
+        '''
+        Handles one request, returns (HTTP status, JSON payload)
+        '''
+        if path == '/stats':
+            if method != 'GET':
+                return 405, {'error': 'expected GET'}
+            stats = {}
+            for name, (batcher, _, predictor) in self._endpoints.items():
+                stats[name[1:]] = batcher.stats()
+                if hasattr(predictor, 'stats'):
+                    stats[name[1:]]['cache'] = predictor.stats()
+            return 200, stats
+
+        if path not in self._endpoints:
+            return 404, {'error': f'unknown endpoint {path}'}
+        if method != 'POST':
+            return 405, {'error': 'expected POST'}
+        batcher, regex, _ = self._endpoints[path]
+
+        try:
+            words = json.loads(body)['words']
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'expected JSON object {"words": [...]}'}
+        if not isinstance(words, list):
+            return 400, {'error': 'expected JSON object {"words": [...]}'}
+        bad = [word for word in words if not isinstance(word, str) or not regex.fullmatch(word)]
+        if bad:
+            return 400, {'error': 'unsupported words', 'words': bad}
+        if not words:
+            return 200, {'words': []}
+
+        try:
+            return 200, {'words': await batcher.submit(words)}
+        except Overloaded as e:
+            return 503, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': repr(e)}
+
+    async def _respond(self, writer, status, payload, close=False):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [
+            f'HTTP/1.1 {status} {REASONS[status]}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(body)}',
+        ]
+        if status == 503:
+            head.append('Retry-After: 1')
+        if close:
+            head.append('Connection: close')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(endpoints, host, port, **kwargs):
+    s = await Server(endpoints, **kwargs).start(host, port)
+    print(f'Serving {", ".join(endpoints)} on http://{host}:{port}')
+    async with s:
+        await s.serve_forever()
+
+if __name__ == '__main__':
+    import argparse
+
+    from accent.predictor import Predictor as AccentPredictor
+    from accentru.predictor import Predictor as StressPredictor
+    from translator.cache import CachedPredictor
+    from translator.predictor import Predictor
+
+    parser = argparse.ArgumentParser(description='Serves the translator and accent models over HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default is 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default is 8000)')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help=f'Max number of words in one model call (default is {MAX_BATCH})')
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT * 1000, help=f'Max time to wait for a batch to fill up, in milliseconds (default is {MAX_WAIT * 1000:g})')
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE, help=f'Max number of pending requests per endpoint (default is {MAX_QUEUE})')
+    parser.add_argument('--model', default='model.onnx', help='File name of the translator ONNX file')
+    parser.add_argument('--vocab', default='vocab.json', help='File name of the translator vocab JSON file')
+    parser.add_argument('--data',  default='data/cu-words-civic-dedup.txt', help='File name of the civic to CU dictionary file')
+    parser.add_argument('--accent-model', default='model-accent.onnx', help='File name of the accent ONNX file')
+    parser.add_argument('--accent-vocab', default='vocab-accent.json', help='File name of the accent vocab JSON file')
+    parser.add_argument('--accent-data', default='data/cu-words-civic-dedup-accent.txt', help='File name of the accent cheat map file')
+    parser.add_argument('--stress-model', default='model-accentru.onnx', help='File name of the russian accent ONNX file')
+    parser.add_argument('--stress-vocab', default='vocab-accentru.json', help='File name of the russian accent vocab JSON file')
+    parser.add_argument('--stress-data', default='data/ru_stress_compressed.txt', help='File name of the russian stress dictionary file')
+
+    args = parser.parse_args()
+
+    endpoints = {
+        'translate': (
+            CachedPredictor(Predictor(args.model, args.vocab, args.data)),
+            Predictor.RE,
+        ),
+        'accent': (
+            CachedPredictor(AccentPredictor(args.accent_model, args.accent_vocab, args.accent_data)),
+            AccentPredictor.RE,
+        ),
+        'stress': (
+            CachedPredictor(StressPredictor(args.stress_model, args.stress_vocab, args.stress_data)),
+            StressPredictor.RE,
+        ),
+    }
+
+    asyncio.run(serve(endpoints, args.host, args.port,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait / 1000,
+        max_queue=args.max_queue,
+    ))
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import onnxruntime as ort
+
+from translator.batching import MAX_LEN
+
+# EXTENDED optimizations are portable: unlike ORT_ENABLE_ALL, the saved model has no
+# hardware-specific layout transformations and can be reused on another machine
+OPTIMIZATION_LEVEL = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+# sessions run with all optimizations: on the cached graph, only the layout
+# transformations are left to do on load
+SERVING_LEVEL = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+
+def create_session(onnx_model, *, threads=None, cache=True, warm_up=True):
+    '''
+    Creates onnxruntime inference session.
+
+    threads: number of intra-op threads (default is one per core). Set it when running
+        several sessions in parallel processes, so they do not oversubscribe the cores.
+    cache: if True, optimized graph is saved next to the model (see optimized_filename)
+        and later loads skip all but the layout optimizations. Cached graph is re-built
+        when the model file is newer.
+    warm_up: if True, runs a synthetic batch, so that the first real request does not
+        pay for the lazy initialization (memory arenas, kernel selection).
+    '''
+    options = ort.SessionOptions()
+    if threads is not None:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+
+    session = None
+    if cache:
+        session = _load_optimized(onnx_model, options)
+    if session is None:
+        options.graph_optimization_level = SERVING_LEVEL
+        session = ort.InferenceSession(onnx_model, options)
+
+    if warm_up:
+        session.run(None, synthetic_inputs(session))
+
+    return session
+
+def optimized_filename(onnx_model):
+    base, ext = os.path.splitext(onnx_model)
+    return base + '.optimized' + ext
+
+def synthetic_inputs(session, batch_size=1, seq_len=MAX_LEN):
+    '''
+    All-zero (padding) inputs, dynamic axes are set to batch_size and seq_len
+    '''
+    feed = {}
+    for x in session.get_inputs():
+        assert x.type == 'tensor(int32)', x.type
+        shape = [d if isinstance(d, int) else size for d, size in zip(x.shape, (batch_size, seq_len))]
+        feed[x.name] = np.zeros(shape, dtype=np.int32)
+    return feed
+
+def _load_optimized(onnx_model, options):
+    filename = optimized_filename(onnx_model)
+    if os.path.isfile(filename) and os.path.getmtime(filename) >= os.path.getmtime(onnx_model):
+        options.graph_optimization_level = SERVING_LEVEL
+        try:
+            return ort.InferenceSession(filename, options)
+        except Exception as e:
+            print(f'Failed to load {filename}, re-optimizing: {e}')
+
+    if not os.access(os.path.dirname(os.path.abspath(filename)), os.W_OK):
+        return None
+
+    # several processes may start at once: write to a private file, then rename
+    tmp_filename = f'{filename}.{os.getpid()}.tmp'
+    save_options = ort.SessionOptions()
+    save_options.graph_optimization_level = OPTIMIZATION_LEVEL
+    save_options.optimized_model_filepath = tmp_filename
+    ort.InferenceSession(onnx_model, save_options)
+    os.replace(tmp_filename, filename)
+
+    options.graph_optimization_level = SERVING_LEVEL
+    return ort.InferenceSession(filename, options)
@@ -0,0 +1,160 @@
+'''
+Streaming translation of civic text documents to Church Slavonic.
+
+    python -m translator.translate book.txt > book-cu.txt
+    cat book.txt | python -m translator.translate > book-cu.txt
+
+Text is read in chunks, split into words and non-words (punctuation, spaces, numbers).
+Words are translated in windows: every window is deduplicated and all dictionary
+misses go through the model in one batch. Output is written in order, memory use
+is bounded by the chunk and window sizes.
+'''
+import contextlib
+import io
+import re
+import sys
+
+from translator.cache import CachedPredictor, restore_caps
+from translator.numerals import cu_format_int
+from translator.predictor import Predictor
+
+CHUNK_SIZE = 64 * 1024  # characters
+WINDOW = 10_000  # pieces (words and non-words)
+MAX_WORD = 1024  # characters, longer runs of letters are cut
+
+RE_SPLITTER = re.compile(f'({Predictor.RE})', flags=re.IGNORECASE)
+RE_WORD = re.compile(f'^{Predictor.RE}$', flags=re.IGNORECASE)
+RE_LAST_SPACE = re.compile(r'\s+\S*$')
+RE_NUMBER = re.compile(r'\d+')
+
+
+def read_chunks(f, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def split_text(chunks, chunk_size=CHUNK_SIZE, max_word=MAX_WORD):
+    '''
+    Splits stream of text chunks into words and non-words. Pieces that may continue
+    in the next chunk are held back, so no word (or run of spaces, digits) is cut.
+    Held back text is bounded: a run of non-words longer than chunk_size is cut before
+    its last space, or inside the run if there is none (e.g. a long run of digits), and
+    a word longer than max_word is cut.
+    '''
+    tail = ''
+    for chunk in chunks:
+        pieces = RE_SPLITTER.split(tail + chunk)
+        if pieces[-1]:
+            # trailing non-word may continue in the next chunk
+            tail = pieces[-1]
+            pieces = pieces[:-1]
+            if len(tail) > chunk_size:
+                mtc = RE_LAST_SPACE.search(tail)
+                if mtc is not None and mtc.start() > 0 and len(tail) - mtc.start() <= chunk_size:
+                    cut = mtc.start()
+                else:
+                    cut = len(tail) - chunk_size
+                pieces.append(tail[:cut])
+                tail = tail[cut:]
+        else:
+            # last word may continue in the next chunk
+            tail = pieces[-2]
+            pieces = pieces[:-2]
+            if len(tail) > max_word:
+                pieces.append(tail[:-max_word])
+                tail = tail[-max_word:]
+
+        for piece in pieces:
+            if piece:
+                yield piece
+    if tail:
+        yield from (piece for piece in RE_SPLITTER.split(tail) if piece)
+
+def translate_text(predictor, pieces, *, window=WINDOW, casing='match', numerals=True):
+    '''
+    Translates stream of text pieces (see split_text), yields translated pieces in order.
+    '''
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= window:
+            yield from translate_window(predictor, buffer, casing=casing, numerals=numerals)
+            buffer = []
+    yield from translate_window(predictor, buffer, casing=casing, numerals=numerals)
+
+def translate_window(predictor, pieces, *, casing='match', numerals=True):
+    words = [piece for piece in pieces if RE_WORD.match(piece)]
+    translations = iter(predictor.batch(words))
+
+    for piece in pieces:
+        if not RE_WORD.match(piece):
+            yield map_punctuation(piece, numerals)
+            continue
+
+        t = next(translations)
+        if casing == 'match':
+            t = restore_caps(piece, t)
+        elif casing == 'lower':
+            t = t.lower()
+        elif casing == 'upper':
+            t = t.upper()
+        yield t
+
+def map_punctuation(text, numerals=True):
+    '''
+    Same as mapPunctuation in ui/src/App.svelte, except that line breaks are preserved
+    '''
+    text = text.replace('//', ' *')
+    text = text.replace('/', ' *')
+    text = text.replace(';', '.')
+    text = text.replace('?', ';')
+    text = re.sub(r'[^\S\n]+', ' ', text)
+
+    if numerals:
+        text = RE_NUMBER.sub(lambda mtc: cu_format_int(int(mtc.group())), text)
+
+    return text
+
+def translate_files(predictor, filenames, out, **kwargs):
+    for filename in filenames:
+        if filename == '-':
+            f = contextlib.nullcontext(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'))
+        else:
+            f = open(filename, encoding='utf-8')
+        with f:
+            for piece in translate_text(predictor, split_text(read_chunks(f)), **kwargs):
+                out.write(piece)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Translates civic text to Church Slavonic')
+    parser.add_argument('input', nargs='*', default=['-'], help='Input text files (default is stdin)')
+    parser.add_argument('-o', '--output', help='Output file name (default is stdout)')
+    parser.add_argument('-m', '--model', default='model.onnx', help='File name of the model ONNX file')
+    parser.add_argument('-v', '--vocab', default='vocab.json', help='File name of the vocab JSON file')
+    parser.add_argument('-d', '--data',  default='data/cu-words-civic-dedup.txt', help='File name of the civic to CU dictionary file')
+    parser.add_argument('--casing', choices=['match', 'lower', 'upper'], default='match', help='Output letter case (default is "match")')
+    parser.add_argument('--no-numerals', action='store_true', help='Do not convert numbers to Church Slavonic numerals')
+    parser.add_argument('-w', '--window', type=int, default=WINDOW, help=f'Number of text pieces translated in one batch (default is {WINDOW})')
+
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        predictor = CachedPredictor(Predictor(args.model, args.vocab, args.data))
+
+    if args.output is None:
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    else:
+        out = open(args.output, 'w', encoding='utf-8')
+    with out:
+        translate_files(predictor, args.input, out,
+            window=args.window,
+            casing=args.casing,
+            numerals=not args.no_numerals,
+        )
+
+    print(predictor.stats(), file=sys.stderr)
@@ -1,45 +1,63 @@
 import os
-import random
 
 import lightning as L
-import torch
-import torch.utils.data
+import numpy as np
+
+from translator.batching import padded_lengths
+from translator.dataset_cache import (append_arrays, batch_loader, cache_dir, close_cache, expand, file_hash, indices, is_val,
+    load_arrays, one_hot, open_cache, positions)
+from translator.encoder import Encoder
 
 
 class TranslatorDataset(L.LightningDataModule):
     def __init__(self, *, fname='data/cu-words-civic-dedup.txt',
-            max_len=32, batch_size=512):
+            max_len=32, batch_size=512, prefetch=False, bucket=True):
         super().__init__()
         self.fname = fname
         self.max_len = max_len
         self.batch_size = batch_size
-        self._cache = os.path.expanduser(r'~/.cache/translator_dataset7')
+        self.prefetch = prefetch
+        self.bucket = bucket
+        self._name = 'translator_dataset'
+
+    @property
+    def sources(self):
+        return [self.fname]
 
     def cache(self, name):
         return os.path.join(self._cache, name)
 
     def prepare_data(self):
-        force = self._build_vocab()
-        force = self._make_tensors(force)
+        with open(self.fname, encoding='utf-8') as f:
+            lines = [l.strip() for l in f if l.strip()]
+        print(f'Loaded {len(lines)} samples')
 
-    def _build_vocab(self):
-        if all(os.path.isfile(x) for x in [
-            self.cache('vocab.txt'),
-            self.cache('train.txt'),
-            self.cache('val.txt'),
-        ]):
-            return False
+        self._build_vocab(lines)
 
-        os.makedirs(self.cache(''), exist_ok=True)
+        source = file_hash(*self.sources)
+        lines = open_cache(self._cache, lines, source)
+        if lines is None:
+            return
+        print(f'Adding {len(lines)} new samples to {self._cache}')
 
-        with open(self.fname, encoding='utf-8') as f:
-            dedup = [l.strip().split() for l in f]
-        print(f'Loaded {len(dedup)} samples')
+        with open(self.cache('vocab.txt'), 'w', encoding='utf-8') as f:
+            f.write(' '.join(self.vocab))
+        self._make_tensors(lines)
+        close_cache(self._cache, lines, source)
 
-        random.shuffle(dedup)
-        val_partition = dedup[:int(0.02 * len(dedup))]
-        train_partition = dedup[len(val_partition):]
+    def _build_vocab(self, lines):
+        charset = set()
+        for l in lines:
+            cu, ru = l.split()[:2]
+            charset.update(cu)
+            charset.update(ru.replace('\u0301', ''))
+        vocab = ['<pad>'] + sorted(charset)
+        print(f'Vocab length: {len(vocab)}')
+
+        self.vocab = { c: i for i,c in enumerate(vocab) }
+        self._cache = cache_dir(self._name, self.fname, self.max_len, vocab)
 
+    def _make_tensors(self, lines):
         def enrich_with_accent(partition):
             out = []
             naked_count = 0
@@ -58,111 +76,61 @@ class TranslatorDataset(L.LightningDataModule):
             print(len(out), naked_count, acc_count)
             return out
 
-        val_partition = enrich_with_accent(val_partition)
-        train_partition = enrich_with_accent(train_partition)
-
-        charset = set()
-        for cu, ru, _ in train_partition + val_partition:
-            charset.update(cu)
-            charset.update(ru)
-        vocab = ['<pad>'] + sorted(charset)
-        print(f'Vocab length: {len(vocab)}')
-
-        with open(self.cache('vocab.txt'), 'w', encoding='utf-8') as f:
-            f.write(' '.join(vocab))
-
-        with open(self.cache('train.txt'), 'w', encoding='utf-8') as f:
-            for x, y, a in train_partition:
-                f.write(f'{x}\t{y}\t{a}\n')
-        with open(self.cache('val.txt'), 'w', encoding='utf-8') as f:
-            for x, y, a in val_partition:
-                f.write(f'{x}\t{y}\t{a}\n')
-
-        return True
-
-    def _make_tensors(self, force=False):
-
-        with open(self.cache('vocab.txt'), encoding='utf-8') as f:
-            chars = f.read().strip().split()
-        self.vocab = { c: i for i,c in enumerate(chars) }
-        print(f'Loaded vocab of size {len(self.vocab)}')
-
-        if not force and \
-                os.path.isfile(self.cache('dataset_train.pth')) and \
-                os.path.isfile(self.cache('dataset_val.pth')):
-            return False
-
-        with open(self.cache('train.txt'), encoding='utf-8') as f:
-            train_data = [l.strip().split() for l in f]
-        print(f'Loaded {len(train_data)} train samples')
-
-        with open(self.cache('val.txt'), encoding='utf-8') as f:
-            val_data = [l.strip().split() for l in f]
-        print(f'Loaded {len(val_data)} val samples')
-
-        for x, y, _ in train_data + val_data:
+        dedup = [l.split()[:2] for l in lines]
+        for x, y in dedup:
             if len(x) > self.max_len:
                 raise RuntimeError(f'Sample too long: {x}')
-            if len(y) > self.max_len:
+            if len(y.replace('\u0301', '')) > self.max_len:
                 raise RuntimeError(f'Sample too long: {y}')
 
+        train_data = enrich_with_accent([(cu, ru) for cu, ru in dedup if not is_val(ru.replace('\u0301', ''))])
+        val_data = enrich_with_accent([(cu, ru) for cu, ru in dedup if is_val(ru.replace('\u0301', ''))])
+
+        encoder = Encoder(self.vocab, max_len=self.max_len)
+
         def mk_tensors(dataset):
-            dataset_cu  = torch.zeros( (len(dataset), self.max_len), dtype=torch.long)
-            dataset_cu_len = torch.zeros( (len(dataset),), dtype=torch.long)
-            dataset_ru  = torch.zeros( (len(dataset), self.max_len), dtype=torch.long)
-            dataset_ru_acc  = torch.zeros( (len(dataset), self.max_len), dtype=torch.long)
-            dataset_ru_len  = torch.zeros( (len(dataset),), dtype=torch.long)
-
-            count = 0
-            acct = 0
-            for cu, ru, astr in dataset:
-                ai = int(astr)
-                dataset_cu_len[count] = len(cu)
-                dataset_cu[count, :len(cu)] = torch.tensor([
-                    self.vocab[x] for x in cu
-                ], dtype=torch.long)
-                dataset_ru_len[count] = len(ru)
-                dataset_ru[count, :len(ru)] = torch.tensor([
-                    self.vocab[x] for x in ru
-                ], dtype=torch.long)
-                if ai >= 0:
-                    acct += 1
-                    dataset_ru_acc[count, ai] = 1
-                count += 1
-                if count % 10_000 == 0:
-                    print(count)
-            print(count , acct)
+            # whole partition is encoded at once
+            cu, cu_len, _ = encoder([cu for cu, _, _ in dataset])
+            ru, ru_len, _ = encoder([ru for _, ru, _ in dataset])
+            ai = np.array([ai for _, _, ai in dataset], dtype=np.int64)
+            print(len(dataset), (ai >= 0).sum())
             return {
-                'cu': dataset_cu,
-                'cu_len': dataset_cu_len,
-                'ru': dataset_ru,
-                'ru_acc': dataset_ru_acc,
-                'ru_len': dataset_ru_len,
+                'cu': indices(cu, self.vocab_size),
+                'cu_len': indices(cu_len, self.vocab_size),
+                'ru': indices(ru, self.vocab_size),
+                'ru_acc': positions(ai),
+                'ru_len': indices(ru_len, self.vocab_size),
             }
 
-        train = mk_tensors(train_data)
-        val   = mk_tensors(val_data)
-
-        torch.save(train, self.cache('dataset_train.pth'))
-        torch.save(val, self.cache('dataset_val.pth'))
-
-        return True
+        for name, dataset in [('train', train_data), ('val', val_data)]:
+            with open(self.cache(f'{name}.txt'), 'a', encoding='utf-8') as f:
+                for x, y, a in dataset:
+                    f.write(f'{x}\t{y}\t{a}\n')
+            append_arrays(self.cache(name), **mk_tensors(dataset))
 
     def setup(self, stage=None):
-        self.train_data = Dataset(torch.load(self.cache('dataset_train.pth')))
-        self.val_data = Dataset(torch.load(self.cache('dataset_val.pth')))
+        self.train_data = Dataset(load_arrays(self.cache('train'), Dataset.ARRAYS))
+        self.val_data = Dataset(load_arrays(self.cache('val'), Dataset.ARRAYS))
 
     def train_dataloader(self):
-        return torch.utils.data.DataLoader(self.train_data, batch_size=self.batch_size, shuffle=True)
+        return batch_loader(self.train_data, self.batch_size, shuffle=True, prefetch=self.prefetch,
+            buckets=self.train_data.buckets if self.bucket else None)
 
     def val_dataloader(self):
-        return torch.utils.data.DataLoader(self.val_data, batch_size=self.batch_size, shuffle=True)
+        return batch_loader(self.val_data, self.batch_size, shuffle=True, prefetch=self.prefetch,
+            buckets=self.val_data.buckets if self.bucket else None)
 
     @property
     def vocab_size(self):
         return len(self.vocab)
 
 class Dataset:
+    '''
+    Memory-mapped compact arrays (see translator.dataset_cache), expanded to int64 tensors
+    per batch. `ru_acc` is stored as accent position and expanded to one-hot.
+    '''
+    ARRAYS = ('cu', 'cu_len', 'ru', 'ru_acc', 'ru_len')
+
     def __init__(self, datum):
         self.ru = datum['ru']
         self.ru_acc = datum['ru_acc']
@@ -170,18 +138,29 @@ class Dataset:
         self.ru_len = datum['ru_len']
         self.cu_len = datum['cu_len']
         assert self.ru.shape == self.cu.shape
-        assert self.cu_len.shape == self.ru_len.shape, (self.ru_len.shape, self.cu_len.shape)
+        assert self.cu_len.shape == self.ru_len.shape == self.ru_acc.shape, (self.ru_len.shape, self.cu_len.shape)
+
+    @property
+    def buckets(self):
+        '''
+        Padded length of every sample for bucketing (see translator.batching), or the target
+        length if it is longer: CTC needs at least as many positions as there are targets
+        '''
+        return np.maximum(padded_lengths(self.ru_len, max_len=self.ru.shape[1]), self.cu_len)
 
     def __len__(self):
         return self.cu.shape[0]
 
     def __getitem__(self, i):
+        '''
+        i is a sample index, or a list of indices (then all tensors get the batch dimension)
+        '''
         return {
-            'cu': self.cu[i],
-            'ru': self.ru[i],
-            'ru_acc': self.ru_acc[i],
-            'cu_len': self.cu_len[i],
-            'ru_len': self.ru_len[i],
+            'cu': expand(self.cu[i]),
+            'ru': expand(self.ru[i]),
+            'ru_acc': one_hot(self.ru_acc[i], self.ru.shape[1]),
+            'cu_len': expand(self.cu_len[i]),
+            'ru_len': expand(self.ru_len[i]),
         }
 
 
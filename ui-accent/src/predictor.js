@@ -66,11 +66,16 @@ export class Predictor {
             }
             const inputs = new Tensor(inputsArray, [1, 32]);  // batch_size=1
             const outputs = await this.session.run({ inputs });
-            for (let i = 0; i < text.length; i++) {  // upsampled sequence length
-                const [low, high] = outputs.logits.data.slice(i * 2, i * 2 + 2);
-                if (high > low) {
-                    accentIndex = i;
-                    break;
+            if (outputs.accent !== undefined) {
+                // model with in-graph accent decision
+                accentIndex = outputs.accent.data[0];
+            } else {
+                for (let i = 0; i < text.length; i++) {  // upsampled sequence length
+                    const [low, high] = outputs.logits.data.slice(i * 2, i * 2 + 2);
+                    if (high > low) {
+                        accentIndex = i;
+                        break;
+                    }
                 }
             }
             if (accentIndex === undefined) {
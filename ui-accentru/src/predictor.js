@@ -64,13 +64,18 @@ export class Predictor {
             }
             const inputs = new Tensor(inputsArray, [1, 32]);  // batch_size=1
             const outputs = await this.session.run({ inputs });
-            let best = -100000.;
-            accentIndex = 0;
-            for (let i = 0; i < text.length; i++) {  // upsampled sequence length
-                const [low, high] = outputs.logits.data.slice(i * 2, i * 2 + 2);
-                if (high - low > best) {
-                    accentIndex = i;
-                    best = high - low;
+            if (outputs.accent !== undefined) {
+                // model with in-graph accent decision
+                accentIndex = outputs.accent.data[0];
+            } else {
+                let best = -100000.;
+                accentIndex = 0;
+                for (let i = 0; i < text.length; i++) {  // upsampled sequence length
+                    const [low, high] = outputs.logits.data.slice(i * 2, i * 2 + 2);
+                    if (high - low > best) {
+                        accentIndex = i;
+                        best = high - low;
+                    }
                 }
             }
         }